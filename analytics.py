@@ -0,0 +1,315 @@
+import functools
+import re
+import sys
+from array import array
+from datetime import datetime, timezone
+from math import isnan, nan
+
+import numpy as np
+
+from extractor import TABLES
+from vessel import parse_number
+
+# Upper bounds in hours of the time-in-port distribution; longer calls fall into a last, open bucket
+DURATION_BUCKETS = (1, 3, 6, 12, 24, 48, 96, 168)
+
+TIMESTAMP = re.compile(r'(\d{4})-(\d{2})-(\d{2})[ T](\d{2}):(\d{2})')
+DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)\s*(d|days?|h|hrs?|hours?|m|mins?|minutes?)\b', re.IGNORECASE)
+DURATION_UNITS = {'d': 86400, 'h': 3600, 'm': 60}
+
+
+# Every run repeats the recent rows of the run before, so most values have been parsed already
+@functools.lru_cache(maxsize=1 << 16)
+def parse_time(value):
+    """Unix timestamp of a table value like '2024-05-01 12:00' (UTC), None if it has no timestamp."""
+    match = TIMESTAMP.search(value or '')
+    if not match:
+        return None
+    return datetime(*map(int, match.groups()), tzinfo=timezone.utc).timestamp()
+
+
+@functools.lru_cache(maxsize=1 << 12)
+def parse_duration(value):
+    """Seconds of a time in port like '5 h', '1d 3h', '2 days 4 hours' or '45 min', None if there is none."""
+    parts = DURATION_PART.findall(value or '')
+    if not parts:
+        return None
+    return sum(float(number) * DURATION_UNITS[unit[0].lower()] for number, unit in parts)
+
+
+def duration_bucket(seconds):
+    """Index of the DURATION_BUCKETS bucket a time in port falls into."""
+    hours = seconds / 3600
+    for index, bound in enumerate(DURATION_BUCKETS):
+        if hours <= bound:
+            return index
+    return len(DURATION_BUCKETS)
+
+
+def bucket_label(index):
+    if index == len(DURATION_BUCKETS):
+        return f">{DURATION_BUCKETS[-1]} h"
+    lower = DURATION_BUCKETS[index - 1] if index else 0
+    return f"{lower}-{DURATION_BUCKETS[index]} h"
+
+
+def port_name(value):
+    value = (value or '').strip()
+    return sys.intern(value) if value else None
+
+
+class PortCall:
+    """One row of a vessel's 'Port Calls' table with parsed times; duration in seconds."""
+
+    __slots__ = ('ship_id', 'port', 'arrival', 'departure', 'duration')
+
+    def __init__(self, ship_id, port, arrival, departure=None, duration=None):
+        self.ship_id = ship_id
+        self.port = port
+        self.arrival = arrival
+        self.departure = departure
+        self.duration = duration
+
+    @classmethod
+    def from_row(cls, ship_id, row):
+        """:param row: dict as extracted, see extractor.TABLES['Port Calls']"""
+        arrival, departure = parse_time(row.get('arrival')), parse_time(row.get('departure'))
+        duration = parse_duration(row.get('time_in_port'))
+        if duration is None and arrival is not None and departure is not None:
+            duration = departure - arrival
+        return cls(ship_id, port_name(row.get('port')), arrival, departure, duration)
+
+    def __repr__(self):
+        return f"PortCall({self.ship_id!r}, {self.port!r}, arrival={self.arrival}, duration={self.duration})"
+
+
+class Trip:
+    """One row of a vessel's 'Last Trips' table with parsed times; distance in nautical miles."""
+
+    __slots__ = ('ship_id', 'origin', 'departure', 'destination', 'arrival', 'distance')
+
+    def __init__(self, ship_id, origin, departure, destination, arrival=None, distance=None):
+        self.ship_id = ship_id
+        self.origin = origin
+        self.departure = departure
+        self.destination = destination
+        self.arrival = arrival
+        self.distance = distance
+
+    @classmethod
+    def from_row(cls, ship_id, row):
+        """:param row: dict as extracted, see extractor.TABLES['Last Trips']"""
+        return cls(ship_id, port_name(row.get('origin')), parse_time(row.get('departure')),
+                   port_name(row.get('destination')), parse_time(row.get('arrival')),
+                   parse_number(row.get('distance') or ''))
+
+    def __repr__(self):
+        return f"Trip({self.ship_id!r}, {self.origin!r} -> {self.destination!r}, departure={self.departure})"
+
+
+class CallColumns:
+    """
+    In-memory columns of all port calls for vectorized group-bys: port and ship as codes into
+    per-column value lists, times and durations as float64 with NaN where unknown.
+    Refreshed incrementally from the rows changed since the last load.
+    """
+
+    def __init__(self):
+        self.seq = 0
+        self.positions = {}
+        self.ports, self.port_index = [], {}
+        self.ships, self.ship_index = [], {}
+        self.port = array('I')
+        self.ship = array('I')
+        self.arrival = array('d')
+        self.duration = array('d')
+
+    def code(self, values, index, value):
+        if value not in index:
+            index[value] = len(values)
+            values.append(value)
+        return index[value]
+
+    def load(self, rows):
+        for row_id, ship_id, port, arrival, duration, seq in rows:
+            duration = nan if duration is None else duration
+            position = self.positions.get(row_id)
+            if position is None:
+                self.positions[row_id] = len(self.port)
+                self.port.append(self.code(self.ports, self.port_index, port))
+                self.ship.append(self.code(self.ships, self.ship_index, ship_id))
+                self.arrival.append(arrival)
+                self.duration.append(duration)
+            else:
+                self.duration[position] = duration
+            self.seq = max(self.seq, seq)
+
+    def column(self, name):
+        column = getattr(self, name)
+        return np.frombuffer(column, dtype=np.uint32 if column.typecode == 'I' else np.float64)
+
+
+class PortAnalytics:
+    """
+    Fleet-wide port-call and trip analytics on top of the SnapshotStore.
+
+    Every run repeats the last port calls and trips of its vessels, so the raw table rows of all runs
+    are normalized once into typed, deduplicated rows: a port call is keyed by ship, port and arrival,
+    a trip by ship, origin and departure. A call first seen without departure is completed by a later run.
+    SQLite triggers keep the aggregates up to date as rows arrive: port -> vessels with call counts and
+    first/last arrival, and the time-in-port distribution per port. The vessel -> port sequence is the
+    call table itself, indexed by ship and arrival. Runs are ingested once, so update() only reads new runs.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.db = store.db
+        self.calls = CallColumns()
+        self.db.execute("""CREATE TABLE IF NOT EXISTS analytics_runs (
+            run_id INTEGER PRIMARY KEY REFERENCES runs (id) ON DELETE CASCADE)""")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS typed_port_calls (
+            id INTEGER PRIMARY KEY, ship_id TEXT, port TEXT, arrival REAL, departure REAL, duration REAL,
+            bucket INTEGER, seq INTEGER, UNIQUE (ship_id, port, arrival))""")
+        self.db.execute("CREATE INDEX IF NOT EXISTS typed_port_calls_ship_arrival ON typed_port_calls (ship_id, arrival)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS typed_port_calls_seq ON typed_port_calls (seq)")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS typed_trips (
+            id INTEGER PRIMARY KEY, ship_id TEXT, origin TEXT, departure REAL, destination TEXT, arrival REAL,
+            distance_nm REAL, UNIQUE (ship_id, origin, departure))""")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS port_vessels (
+            port TEXT, ship_id TEXT, calls INTEGER, first_arrival REAL, last_arrival REAL,
+            PRIMARY KEY (port, ship_id)) WITHOUT ROWID""")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS port_durations (
+            port TEXT, bucket INTEGER, calls INTEGER, seconds REAL, PRIMARY KEY (port, bucket)) WITHOUT ROWID""")
+        # Ignored duplicates fire no trigger, so every call is counted once
+        self.db.execute("""CREATE TRIGGER IF NOT EXISTS calls_port_vessels AFTER INSERT ON typed_port_calls BEGIN
+            INSERT INTO port_vessels VALUES (new.port, new.ship_id, 1, new.arrival, new.arrival)
+            ON CONFLICT (port, ship_id) DO UPDATE SET calls = calls + 1,
+                first_arrival = MIN(first_arrival, new.arrival), last_arrival = MAX(last_arrival, new.arrival); END""")
+        self.db.execute("""CREATE TRIGGER IF NOT EXISTS calls_duration_insert AFTER INSERT ON typed_port_calls
+            WHEN new.duration IS NOT NULL BEGIN
+            INSERT INTO port_durations VALUES (new.port, new.bucket, 1, new.duration)
+            ON CONFLICT (port, bucket) DO UPDATE SET calls = calls + 1, seconds = seconds + new.duration; END""")
+        self.db.execute("""CREATE TRIGGER IF NOT EXISTS calls_duration_update AFTER UPDATE OF duration ON typed_port_calls
+            WHEN old.duration IS NULL AND new.duration IS NOT NULL BEGIN
+            INSERT INTO port_durations VALUES (new.port, new.bucket, 1, new.duration)
+            ON CONFLICT (port, bucket) DO UPDATE SET calls = calls + 1, seconds = seconds + new.duration; END""")
+        self.db.commit()
+
+    def update(self):
+        """
+        Ingests the port calls and trips of all runs recorded since the last update.
+        :return: number of ingested runs
+        """
+        run_ids = [row[0] for row in self.db.execute(
+            "SELECT id FROM runs WHERE id NOT IN (SELECT run_id FROM analytics_runs) ORDER BY name")]
+        if not run_ids:
+            return 0
+        seq = self.db.execute("SELECT COALESCE(MAX(seq), 0) FROM typed_port_calls").fetchone()[0]
+        with self.db:
+            for run_id in run_ids:
+                seq += 1
+                self.ingest(run_id, seq)
+                self.db.execute("INSERT INTO analytics_runs VALUES (?)", (run_id,))
+        return len(run_ids)
+
+    def ingest(self, run_id, seq):
+        call_columns = TABLES['Port Calls'][1]
+        rows = self.db.execute(f"SELECT ship_id, {', '.join(call_columns)} FROM port_calls WHERE run_id = ?", (run_id,))
+        calls = (PortCall.from_row(ship_id, dict(zip(call_columns, values))) for ship_id, *values in rows)
+        self.db.executemany("""INSERT INTO typed_port_calls (ship_id, port, arrival, departure, duration, bucket, seq)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (ship_id, port, arrival) DO UPDATE SET
+                departure = excluded.departure, duration = excluded.duration, bucket = excluded.bucket, seq = excluded.seq
+            WHERE typed_port_calls.duration IS NULL AND excluded.duration IS NOT NULL""",
+            [(call.ship_id, call.port, call.arrival, call.departure, call.duration,
+              duration_bucket(call.duration) if call.duration is not None else None, seq)
+             for call in calls if call.port and call.arrival is not None])
+
+        trip_columns = TABLES['Last Trips'][1]
+        rows = self.db.execute(f"SELECT ship_id, {', '.join(trip_columns)} FROM trips WHERE run_id = ?", (run_id,))
+        trips = (Trip.from_row(ship_id, dict(zip(trip_columns, values))) for ship_id, *values in rows)
+        self.db.executemany("""INSERT INTO typed_trips (ship_id, origin, departure, destination, arrival, distance_nm)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (ship_id, origin, departure) DO UPDATE SET
+                destination = excluded.destination, arrival = excluded.arrival, distance_nm = excluded.distance_nm
+            WHERE typed_trips.arrival IS NULL AND excluded.arrival IS NOT NULL""",
+            [(trip.ship_id, trip.origin, trip.departure, trip.destination, trip.arrival, trip.distance)
+             for trip in trips if trip.origin and trip.departure is not None])
+
+    def refresh(self):
+        """Brings the in-memory call columns up to date with the calls added or completed since the last refresh."""
+        self.calls.load(self.db.execute("SELECT id, ship_id, port, arrival, duration, seq FROM typed_port_calls WHERE seq > ? ORDER BY id",
+                                        (self.calls.seq,)))
+        return self.calls
+
+    def port_summary(self, ship_ids=None, start=None, end=None):
+        """
+        Ports called at within [start, end], e.g. by the vessels seen in an area during the last 90 days.
+        :param ship_ids: only calls of these vessels, all if None
+        :param start, end: arrival window as datetimes or Unix timestamps, open if None
+        :return: list of dicts with port, calls, vessels, median and mean hours in port, most vessels first
+        """
+        calls = self.refresh()
+        start, end = self.store.window(start, end)
+        port, ship = calls.column('port'), calls.column('ship')
+        arrival, duration = calls.column('arrival'), calls.column('duration')
+        mask = (arrival >= start) & (arrival <= end)
+        if ship_ids is not None:
+            codes = [calls.ship_index[ship_id] for ship_id in set(ship_ids) if ship_id in calls.ship_index]
+            mask &= np.isin(ship, np.array(codes, dtype=np.uint32))
+        port, ship, duration = port[mask].astype(np.int64), ship[mask].astype(np.int64), duration[mask]
+        if not len(port):
+            return []
+
+        ports = len(calls.ports)
+        call_counts = np.bincount(port, minlength=ports)
+        distinct = np.unique(port * len(calls.ships) + ship) // len(calls.ships)
+        vessel_counts = np.bincount(distinct, minlength=ports)
+
+        known = ~np.isnan(duration)
+        known_port, known_duration = port[known], duration[known]
+        duration_counts = np.bincount(known_port, minlength=ports)
+        mean = np.bincount(known_port, weights=known_duration, minlength=ports) / np.maximum(duration_counts, 1)
+        order = np.lexsort((known_duration, known_port))
+        sorted_duration = known_duration[order]
+        first = np.concatenate(([0], np.cumsum(duration_counts)[:-1]))
+        low = first + np.maximum(duration_counts - 1, 0) // 2
+        high = first + duration_counts // 2
+        median = np.full(ports, nan)
+        has_duration = duration_counts > 0
+        median[has_duration] = (sorted_duration[low[has_duration]] + sorted_duration[high[has_duration]]) / 2
+
+        result = []
+        for code in np.flatnonzero(call_counts).tolist():
+            result.append({'port': calls.ports[code], 'calls': int(call_counts[code]), 'vessels': int(vessel_counts[code]),
+                           'median_hours': None if isnan(median[code]) else round(float(median[code]) / 3600, 2),
+                           'mean_hours': round(float(mean[code]) / 3600, 2) if duration_counts[code] else None})
+        result.sort(key=lambda row: (-row['vessels'], -row['calls'], row['port']))
+        return result
+
+    def port_vessels(self, port):
+        """:return: (ship id, calls, first arrival, last arrival) of every vessel that called at port, most calls first"""
+        return self.db.execute("""SELECT ship_id, calls, first_arrival, last_arrival FROM port_vessels
+            WHERE port = ? ORDER BY calls DESC, ship_id""", (port,)).fetchall()
+
+    def port_sequence(self, ship_id, start=None, end=None):
+        """:return: (port, arrival, departure, duration) of one vessel's calls within [start, end], oldest first"""
+        start, end = self.store.window(start, end)
+        return self.db.execute("""SELECT port, arrival, departure, duration FROM typed_port_calls
+            WHERE ship_id = ? AND arrival BETWEEN ? AND ? ORDER BY arrival""", (ship_id, start, end)).fetchall()
+
+    def time_in_port(self, port=None):
+        """:return: dict of duration bucket label -> number of calls, for one port or all ports"""
+        query = "SELECT bucket, SUM(calls) FROM port_durations"
+        params = ()
+        if port is not None:
+            query += " WHERE port = ?"
+            params = (port,)
+        counts = dict(self.db.execute(query + " GROUP BY bucket", params).fetchall())
+        return {bucket_label(index): counts.get(index, 0) for index in range(len(DURATION_BUCKETS) + 1)}
+
+    def trips(self, ship_id, start=None, end=None):
+        """:return: (origin, departure, destination, arrival, distance in nm) of one vessel's trips within [start, end]"""
+        start, end = self.store.window(start, end)
+        return self.db.execute("""SELECT origin, departure, destination, arrival, distance_nm FROM typed_trips
+            WHERE ship_id = ? AND departure BETWEEN ? AND ? ORDER BY departure""", (ship_id, start, end)).fetchall()
@@ -0,0 +1,298 @@
+import gzip
+import hashlib
+import os
+import re
+import struct
+import threading
+import time
+from collections import defaultdict
+
+from extractor import extract_ship_data
+
+PACK_FILE = 'pages.pack'
+INDEX_FILE = 'pages.idx'
+
+MAGIC = b'VPK1'
+# magic, codec, length of the MMSI, fetch time, raw size, stored size, SHA-1 of the raw page
+RECORD_HEADER = struct.Struct('<4sBBdII20s')
+# MMSI, fetch time, offset and size of the record in the pack, SHA-1 of the raw page
+INDEX_ENTRY = struct.Struct('<QdQI20s')
+
+CODECS = {'gzip': 1, 'zstd': 2}
+CODEC_NAMES = {number: name for name, number in CODECS.items()}
+
+# Loose pages as written by earlier versions, {mmsi}.html next to vessels.json
+PAGE_FILE = re.compile(r'^(\d+)\.html$')
+
+
+def zstd_module():
+    try:
+        import zstandard
+    except ImportError:
+        raise ValueError("Für zstd-komprimierte Seiten wird zstandard benötigt (pip install zstandard).")
+    return zstandard
+
+
+def default_codec():
+    """zstd if the zstandard package is installed, gzip otherwise."""
+    try:
+        zstd_module()
+    except ValueError:
+        return 'gzip'
+    return 'zstd'
+
+
+def compress(codec, data):
+    if codec == 'zstd':
+        return zstd_module().ZstdCompressor(level=9).compress(data)
+    return gzip.compress(data, compresslevel=6, mtime=0)
+
+
+def decompress(codec, data):
+    if codec == 'zstd':
+        return zstd_module().ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+class IndexEntry:
+    __slots__ = ('mmsi', 't', 'offset', 'size', 'sha1')
+
+    def __init__(self, mmsi, t, offset, size, sha1):
+        self.mmsi = mmsi
+        self.t = t
+        self.offset = offset
+        self.size = size
+        self.sha1 = sha1
+
+
+class PageArchive:
+    """
+    Append-only archive of the raw vessel pages of one run directory.
+
+    pages.pack holds one record per fetched page, each compressed on its own (zstd if available,
+    otherwise gzip), so single pages can be read without touching the rest. pages.idx holds a
+    fixed-size entry per record with MMSI, fetch time, offset and hash, and is loaded into memory
+    for random access by MMSI and time. A page fetched again is appended as a new record; lookups
+    return the latest one. If a crash left the index behind the pack, the missing entries are
+    rebuilt from the record headers and a torn last record is cut off.
+    """
+
+    def __init__(self, directory, codec=None):
+        self.directory = directory
+        self.pack_path = os.path.join(directory, PACK_FILE)
+        self.index_path = os.path.join(directory, INDEX_FILE)
+        self.codec = codec or default_codec()
+        self.lock = threading.Lock()
+        self.entries = []
+        self.by_mmsi = defaultdict(list)
+        os.makedirs(directory, exist_ok=True)
+        self.pack = open(self.pack_path, 'a+b')
+        self.index = open(self.index_path, 'a+b')
+        self.load_index()
+
+    @staticmethod
+    def exists(directory):
+        return os.path.exists(os.path.join(directory, PACK_FILE))
+
+    def load_index(self):
+        self.index.seek(0)
+        data = self.index.read()
+        pack_size = os.path.getsize(self.pack_path)
+        end = 0
+        for position in range(0, len(data) - INDEX_ENTRY.size + 1, INDEX_ENTRY.size):
+            mmsi, t, offset, size, sha1 = INDEX_ENTRY.unpack_from(data, position)
+            if offset + size > pack_size:
+                break
+            self.add_entry(IndexEntry(str(mmsi), t, offset, size, sha1))
+            end = offset + size
+        if len(self.entries) * INDEX_ENTRY.size != len(data):
+            self.index.truncate(len(self.entries) * INDEX_ENTRY.size)
+        if end < pack_size:
+            self.recover(end, pack_size)
+
+    def recover(self, offset, pack_size):
+        """Indexes the records after offset that have no index entry, and cuts off a torn last record."""
+        self.pack.seek(offset)
+        while offset + RECORD_HEADER.size <= pack_size:
+            magic, codec, id_length, t, raw_size, stored_size, sha1 = RECORD_HEADER.unpack(self.pack.read(RECORD_HEADER.size))
+            size = RECORD_HEADER.size + id_length + stored_size
+            if magic != MAGIC or offset + size > pack_size:
+                break
+            mmsi = self.pack.read(id_length).decode('ascii')
+            self.pack.seek(stored_size, os.SEEK_CUR)
+            self.write_entry(IndexEntry(mmsi, t, offset, size, sha1))
+            offset += size
+        self.pack.truncate(offset)
+        self.index.flush()
+
+    def add_entry(self, entry):
+        self.entries.append(entry)
+        self.by_mmsi[entry.mmsi].append(entry)
+
+    def write_entry(self, entry):
+        self.index.write(INDEX_ENTRY.pack(int(entry.mmsi), entry.t, entry.offset, entry.size, entry.sha1))
+        self.add_entry(entry)
+
+    def append(self, mmsi, html, t=None):
+        """
+        Adds a page. Thread-safe, and flushed before returning.
+        :param mmsi: numeric ship id of the page
+        :param t: fetch time as Unix timestamp, now if None
+        :return: the IndexEntry of the new record
+        """
+        mmsi = str(mmsi)
+        if not mmsi.isdigit():
+            raise ValueError(f"Ungültige MMSI für das Archiv: {mmsi}")
+        t = time.time() if t is None else t
+        raw = html.encode('utf-8')
+        stored = compress(self.codec, raw)
+        sha1 = hashlib.sha1(raw).digest()
+        record = RECORD_HEADER.pack(MAGIC, CODECS[self.codec], len(mmsi), t, len(raw), len(stored), sha1) + mmsi.encode('ascii') + stored
+        with self.lock:
+            self.pack.seek(0, os.SEEK_END)
+            offset = self.pack.tell()
+            self.pack.write(record)
+            self.pack.flush()
+            entry = IndexEntry(mmsi, t, offset, len(record), sha1)
+            self.write_entry(entry)
+            self.index.flush()
+        return entry
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, mmsi):
+        return str(mmsi) in self.by_mmsi
+
+    def mmsis(self):
+        return list(self.by_mmsi)
+
+    def latest(self, mmsi, at=None):
+        """:return: IndexEntry of the latest page of mmsi fetched at or before `at`, None if there is none"""
+        for entry in reversed(self.by_mmsi.get(str(mmsi), ())):
+            if at is None or entry.t <= at:
+                return entry
+        return None
+
+    def latest_entries(self):
+        """Latest IndexEntry of every MMSI, in the order the MMSIs were first archived."""
+        return [entries[-1] for entries in self.by_mmsi.values()]
+
+    def get(self, mmsi, at=None):
+        """:return: HTML of the latest page of mmsi fetched at or before `at`, None if there is none"""
+        entry = self.latest(mmsi, at)
+        return self.read(entry) if entry else None
+
+    def read(self, entry):
+        with self.lock:
+            self.pack.seek(entry.offset)
+            record = self.pack.read(entry.size)
+        return decode_record(record)[2]
+
+    def iter_pages(self, latest=True):
+        """
+        Streams the archived pages in file order without loading the pack into memory.
+        :param latest: only the latest page of every MMSI
+        :return: iterator of (IndexEntry, HTML)
+        """
+        wanted = {entry.offset for entry in self.latest_entries()} if latest else None
+        with open(self.pack_path, 'rb') as pack:
+            for entry in list(self.entries):
+                if wanted is not None and entry.offset not in wanted:
+                    continue
+                pack.seek(entry.offset)
+                yield entry, decode_record(pack.read(entry.size))[2]
+
+    def compact(self, keep):
+        """
+        Rewrites the archive with only the records of the MMSIs in keep, e.g. after invalid ships were removed.
+        :return: number of dropped records
+        """
+        keep = {str(mmsi) for mmsi in keep}
+        with self.lock:
+            kept = [entry for entry in self.entries if entry.mmsi in keep]
+            dropped = len(self.entries) - len(kept)
+            if not dropped:
+                return 0
+            pack_temp, index_temp = self.pack_path + '.tmp', self.index_path + '.tmp'
+            with open(pack_temp, 'wb') as pack, open(index_temp, 'wb') as index:
+                offset = 0
+                for entry in kept:
+                    self.pack.seek(entry.offset)
+                    pack.write(self.pack.read(entry.size))
+                    index.write(INDEX_ENTRY.pack(int(entry.mmsi), entry.t, offset, entry.size, entry.sha1))
+                    entry.offset = offset
+                    offset += entry.size
+            self.pack.close()
+            self.index.close()
+            os.replace(pack_temp, self.pack_path)
+            os.replace(index_temp, self.index_path)
+            self.pack = open(self.pack_path, 'a+b')
+            self.index = open(self.index_path, 'a+b')
+            self.entries = []
+            self.by_mmsi = defaultdict(list)
+            for entry in kept:
+                self.add_entry(entry)
+        return dropped
+
+    def close(self):
+        self.pack.close()
+        self.index.close()
+
+
+def decode_record(record):
+    """:return: (MMSI, fetch time, HTML) of one packed record"""
+    magic, codec, id_length, t, raw_size, stored_size, sha1 = RECORD_HEADER.unpack_from(record)
+    if magic != MAGIC:
+        raise ValueError("Beschädigter Archiveintrag")
+    start = RECORD_HEADER.size + id_length
+    mmsi = record[RECORD_HEADER.size:start].decode('ascii')
+    return mmsi, t, decompress(CODEC_NAMES[codec], record[start:start + stored_size]).decode('utf-8')
+
+
+def parse_archived_page(location):
+    """
+    Reads and extracts one archived page. Module level so that it can run in worker processes.
+    :param location: (path of pages.pack, IndexEntry offset, IndexEntry size)
+    :return: (ship data, seconds spent extracting), timed in the worker so pool waits are not counted
+    """
+    pack_path, offset, size = location
+    with open(pack_path, 'rb') as pack:
+        pack.seek(offset)
+        html = decode_record(pack.read(size))[2]
+    started = time.perf_counter()
+    ship_data = extract_ship_data(html.replace('\r\n', '\n').replace('\r', '\n'))
+    return ship_data, time.perf_counter() - started
+
+
+def page_files(directory):
+    """Loose {mmsi}.html vessel pages of a run directory, oldest first."""
+    paths = [os.path.join(directory, filename) for filename in os.listdir(directory) if PAGE_FILE.match(filename)]
+    return sorted(paths, key=lambda path: (os.stat(path).st_mtime_ns, path))
+
+
+def migrate_directory(directory, archive=None, remove=True):
+    """
+    Moves the loose {mmsi}.html pages of a run directory into its archive, with their modification
+    time as fetch time. The files are only deleted once the archive holds them on disk.
+    :param archive: open PageArchive of the directory, one is opened and closed again if None
+    :return: number of migrated pages
+    """
+    paths = page_files(directory)
+    if not paths:
+        return 0
+    target = archive if archive is not None else PageArchive(directory)
+    try:
+        for path in paths:
+            with open(path, 'rb') as file:
+                content = file.read()
+            target.append(PAGE_FILE.match(os.path.basename(path)).group(1), content.decode('utf-8'), os.stat(path).st_mtime)
+        os.fsync(target.pack.fileno())
+        os.fsync(target.index.fileno())
+    finally:
+        if archive is None:
+            target.close()
+    if remove:
+        for path in paths:
+            os.remove(path)
+    return len(paths)
@@ -0,0 +1,212 @@
+"""
+Deterministic benchmark inputs: vesselsonmap TSV feeds, vessel HTML pages and vessels.json files.
+
+Synthetic fixtures are generated from a fixed seed, so every run measures the same input.
+Pages recorded from the live site (see `record`) are used instead of synthetic pages when present.
+
+    python benchmarks/fixtures.py generate [--sizes 100 1000 10000]
+    python benchmarks/fixtures.py record --bbox 23.5 37.8 23.8 38.0 [--limit 200]
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+RECORDED_DIRECTORY = os.path.join(FIXTURE_DIRECTORY, 'recorded')
+SIZES = (100, 1000, 10000)
+# Distinct synthetic pages; larger fleets reuse them under other MMSIs
+PAGE_VARIANTS = 200
+SEED = 17
+
+# Anchorage-like area the synthetic fleet is spread over, as (minlon, minlat, maxlon, maxlat)
+AREA = (23.40, 37.80, 23.80, 38.00)
+
+TYPES = ['Oil Products Tanker', 'Crude Oil Tanker', 'Bulk Carrier', 'General Cargo', 'Container Ship', 'Tug', 'Passenger']
+FLAGS = ['Panama', 'Liberia', 'Marshall Is', 'Malta', 'Greece', 'Comoros', 'Cameroon']
+PORTS = ['Piraeus', 'Elefsis', 'Aspropyrgos', 'Agioi Theodoroi', 'Port Said', 'Novorossiysk', 'Ceyhan', 'Fujairah']
+
+
+def ship_rows(size, seed=SEED):
+    """:return: list of (name, type, mmsi, lat, lon, speed) of a synthetic fleet, a third of it in tight clusters"""
+    rng = random.Random(seed + size)
+    minlon, minlat, maxlon, maxlat = AREA
+    centers = [(rng.uniform(minlat, maxlat), rng.uniform(minlon, maxlon)) for _ in range(max(1, size // 30))]
+    rows = []
+    for index in range(size):
+        if index % 3 == 0:
+            lat, lon = rng.choice(centers)
+            lat, lon = lat + rng.gauss(0, 0.0008), lon + rng.gauss(0, 0.0008)
+        else:
+            lat, lon = rng.uniform(minlat, maxlat), rng.uniform(minlon, maxlon)
+        speed = rng.choice([0.0, 0.1, 0.3, 1.2, 8.5, 12.4])
+        rows.append((f"VESSEL {index}", rng.choice(TYPES), str(200000000 + index), round(lat, 6), round(lon, 6), speed))
+    return rows
+
+
+def feed_text(rows):
+    """vesselsonmap response for the given ships: name, type, MMSI, unused, lat, lon per tab separated line."""
+    return '\n'.join('\t'.join([name, kind, mmsi, '0', f"{lat:.5f}", f"{lon:.5f}"]) for name, kind, mmsi, lat, lon, _ in rows)
+
+
+def table(section_id, header, rows):
+    body = ''.join('<tr>' + ''.join(f'<td class="small">{value}</td>' for value in row) + '</tr>' for row in rows)
+    head = ''.join(f'<th>{column}</th>' for column in header)
+    return (f'<div id="{section_id}" class="myst-section"><h2 class="title">{section_id}</h2>'
+            f'<div class="table-responsive"><table class="myst-table table-striped"><thead><tr>{head}</tr></thead>'
+            f'<tbody>{body}</tbody></table></div></div>')
+
+
+def vessel_page(row, rng, chrome=True):
+    """
+    A vessel page with the layout of the live site: label/value tables and the three port/trip tables.
+    :param chrome: add navigation and scripts, which make up most of a real page
+    """
+    name, kind, mmsi, lat, lon, speed = row
+    length = rng.choice([28, 90, 120, 183, 228, 250, 274, 333])
+    fields = [
+        ('Type', kind), ('IMO', str(9000000 + int(mmsi) % 999999)), ('MMSI', mmsi), ('Flag', rng.choice(FLAGS)),
+        ('Call Sign', f"V7{rng.randint(100, 999)}"), ('Size', f"{length} x {max(8, length // 6)} m"),
+        ('GT', f"{rng.randint(300, 90000):,}"), ('DWT', f"{rng.randint(500, 160000):,} t"), ('Build', str(rng.randint(1985, 2022))),
+        ('Longitude', f"{abs(lon):.5f}&deg; {'E' if lon >= 0 else 'W'}"), ('Latitude', f"{abs(lat):.5f}&deg; {'N' if lat >= 0 else 'S'}"),
+        ('Status', rng.choice(['At Anchor', 'Underway', 'Moored'])), ('Speed', f"{speed} kn"), ('Course', f"{rng.randint(0, 359)}&deg;"),
+        ('Area', 'EMED - East Mediterranean'), ('Station', f"T-{rng.randint(1000, 9999)}"),
+        ('Position Received', f"2024-0{rng.randint(1, 9)}-1{rng.randint(0, 9)} 1{rng.randint(0, 9)}:{rng.randint(10, 59)} UTC"),
+        ('Trip Time', f"{rng.randint(1, 30)} d"), ('Trip Distance', f"{rng.randint(10, 4000)} nm"),
+        ('Average Speed', f"{rng.uniform(5, 14):.1f} kn"), ('Maximum Speed', f"{rng.uniform(10, 16):.1f} kn"),
+        ('Draught', f"{rng.uniform(4, 17):.1f} m"),
+    ]
+    rows = ''.join(f'<tr><td class="label"><b>{label}</b></td><td><span>{value}</span></td></tr>' for label, value in fields)
+    visited = [(rng.choice(PORTS), rng.randint(1, 40)) for _ in range(rng.randint(0, 8))]
+    trips = [(rng.choice(PORTS), '2024-03-01 10:00', rng.choice(PORTS), '2024-03-04 18:00', f"{rng.randint(10, 900)} nm")
+             for _ in range(rng.randint(0, 10))]
+    calls = [(rng.choice(PORTS), '2024-02-01 08:00', '2024-02-03 11:00', f"{rng.randint(1, 72)} h") for _ in range(rng.randint(0, 10))]
+    navigation = ''.join(f'<li class="nav-item"><a href="/ports/{index}">Port {index}</a></li>' for index in range(300 if chrome else 0))
+    script = '<script>var vessels = [' + ','.join(str(rng.random()) for _ in range(400 if chrome else 0)) + '];</script>'
+    return (f'<!DOCTYPE html><html><head><title>{name}</title>{script}</head><body><nav><ul>{navigation}</ul></nav>'
+            f'<div class="container"><h1>{name}</h1><table class="vessel-details">{rows}</table>'
+            + table('ft-visitedports', ['Port', 'Arrivals'], visited)
+            + table('ft-lasttrips', ['Origin', 'Departure', 'Destination', 'Arrival', 'Distance'], trips)
+            + table('ft-portcalls', ['Port', 'Arrival', 'Departure', 'Time in port'], calls)
+            + f'</div><footer>{script}</footer></body></html>')
+
+
+def synthetic_pages(count=PAGE_VARIANTS, seed=SEED):
+    """:return: list of synthetic page HTML"""
+    rng = random.Random(seed)
+    return [vessel_page(row, rng) for row in ship_rows(count, seed)]
+
+
+def load_pages():
+    """Recorded pages if any were recorded, otherwise the synthetic pages. :return: (kind, list of HTML)"""
+    recorded = sorted(glob.glob(os.path.join(RECORDED_DIRECTORY, 'pages', '*.html')))
+    if recorded:
+        pages = []
+        for path in recorded:
+            with open(path, 'r', encoding='utf-8') as file:
+                pages.append(file.read())
+        return 'recorded', pages
+    return 'synthetic', synthetic_pages()
+
+
+def has_recorded_feed():
+    """True if `record` has saved a feed and its area below benchmarks/fixtures/recorded/."""
+    return all(os.path.exists(os.path.join(RECORDED_DIRECTORY, name)) for name in ('area.json', 'feed.tsv'))
+
+
+def fixture_path(size, name):
+    return os.path.join(FIXTURE_DIRECTORY, str(size), name)
+
+
+def feed(size):
+    """
+    Feed lines and bounding box of a synthetic fleet, or of the recorded feed for size 'recorded'.
+    :return: (list of lines, (minlon, minlat, maxlon, maxlat))
+    """
+    if size == 'recorded':
+        if not has_recorded_feed():
+            raise FileNotFoundError(f"Kein aufgezeichneter Feed in {RECORDED_DIRECTORY}; zuerst "
+                                    "'python benchmarks/fixtures.py record --bbox MINLON MINLAT MAXLON MAXLAT' ausführen.")
+        with open(os.path.join(RECORDED_DIRECTORY, 'area.json'), 'r', encoding='utf-8') as file:
+            bbox = tuple(json.load(file)['bbox'])
+        path = os.path.join(RECORDED_DIRECTORY, 'feed.tsv')
+    else:
+        bbox = AREA
+        path = fixture_path(size, 'feed.tsv')
+        if not os.path.exists(path):
+            generate([size])
+    with open(path, 'r', encoding='utf-8') as file:
+        return [line for line in file.read().split('\n') if line.strip()], bbox
+
+
+def vessels(size):
+    """vessels.json content for a synthetic fleet of the given size, generated once and then read from disk."""
+    path = fixture_path(size, 'vessels.json')
+    if not os.path.exists(path):
+        generate([size])
+    with open(path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def generate(sizes=SIZES):
+    """Writes feed.tsv and vessels.json for every size below benchmarks/fixtures/<size>/."""
+    sys.path.insert(0, ROOT)
+    from extractor import extract_ship_data
+
+    rng = random.Random(SEED)
+    for size in sizes:
+        os.makedirs(os.path.join(FIXTURE_DIRECTORY, str(size)), exist_ok=True)
+        rows = ship_rows(size)
+        with open(fixture_path(size, 'feed.tsv'), 'w', encoding='utf-8') as file:
+            file.write(feed_text(rows))
+        data = {row[2]: extract_ship_data(vessel_page(row, rng, chrome=False)) for row in rows}
+        with open(fixture_path(size, 'vessels.json'), 'w', encoding='utf-8') as file:
+            json.dump(data, file, indent=4)
+        print(f"{size} Schiffe: {fixture_path(size, '')}")
+
+
+def record(bbox, limit):
+    """Saves the live feed of an area and up to limit vessel pages as recorded fixtures."""
+    sys.path.insert(0, ROOT)
+    from program import ShipDataAnalyzer
+
+    analyzer = ShipDataAnalyzer(cache_directory=None, store_path=None)
+    lines = analyzer.fetch_area_tile(((), tuple(bbox), 0)) or []
+    pages_directory = os.path.join(RECORDED_DIRECTORY, 'pages')
+    os.makedirs(pages_directory, exist_ok=True)
+    with open(os.path.join(RECORDED_DIRECTORY, 'feed.tsv'), 'w', encoding='utf-8') as file:
+        file.write('\n'.join(lines))
+    with open(os.path.join(RECORDED_DIRECTORY, 'area.json'), 'w', encoding='utf-8') as file:
+        json.dump({'bbox': list(bbox)}, file)
+    ship_ids = list(dict.fromkeys(analyzer.parse_area_feed(lines)['mmsi']))[:limit]
+    with tempfile.TemporaryDirectory() as directory:
+        analyzer.fetch_all_ship_data(ship_ids, directory)
+        # Recorded pages are kept as loose files, so they can be inspected and committed
+        for entry, html in analyzer.page_archive(directory).iter_pages():
+            with open(os.path.join(pages_directory, f"{entry.mmsi}.html"), 'w', encoding='utf-8') as file:
+                file.write(html)
+        analyzer.page_archive(directory).close()
+    print(f"{len(lines)} Zeilen und {len(os.listdir(pages_directory))} Seiten in {RECORDED_DIRECTORY} gespeichert.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Erzeugt oder zeichnet Benchmark-Eingaben auf.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    generate_parser = commands.add_parser('generate', help="Synthetische Eingaben erzeugen")
+    generate_parser.add_argument('--sizes', type=int, nargs='+', default=list(SIZES))
+    record_parser = commands.add_parser('record', help="Feed und Schiffsseiten eines Gebiets aufzeichnen")
+    record_parser.add_argument('--bbox', type=float, nargs=4, required=True, metavar=('MINLON', 'MINLAT', 'MAXLON', 'MAXLAT'))
+    record_parser.add_argument('--limit', type=int, default=200, help="Höchstzahl der Schiffsseiten (Standard: 200)")
+    args = parser.parse_args(argv)
+    if args.command == 'generate':
+        generate(args.sizes)
+    else:
+        record(args.bbox, args.limit)
+
+
+if __name__ == "__main__":
+    main()
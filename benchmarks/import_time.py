@@ -0,0 +1,127 @@
+"""
+Cold-start time of every cli.py subcommand.
+
+Each subcommand runs several times in a fresh interpreter against a small local run directory and
+a stub of the vessel service, and reports the median wall time and the part of it spent importing
+modules (python -X importtime).
+
+    python benchmarks/import_time.py [--repeat 5] [--output import_time.json]
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from stub_server import StubService
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUN = 'data_2024-01-01_00-00-00'
+BBOX = ['23.0', '37.0', '24.0', '38.0']
+SHIPS = [('BENCH ONE', 'Tanker', '211000001', 37.50, 23.50), ('BENCH TWO', 'Cargo', '211000002', 37.5003, 23.5003)]
+
+COMMANDS = {
+    'scan': ['scan', '--bbox', *BBOX],
+    'fetch': ['fetch', '--bbox', *BBOX],
+    'process': ['process', RUN, '--processes', '1'],
+    'migrate': ['migrate', RUN],
+    'pair': ['pair', RUN, '--format', 'csv'],
+    'map': ['map', RUN],
+    'export': ['export', RUN, '--format', 'csv'],
+    'clean': ['clean', RUN],
+    'watch': ['watch', '--bbox', *BBOX, '--cycles', '1', '--interval', '0'],
+    'rendezvous': ['rendezvous', RUN],
+    'ports': ['ports', RUN],
+}
+
+IMPORT_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)')
+
+
+def vessel_page(mmsi, lat, lon):
+    fields = {'Type': 'Oil Products Tanker', 'IMO': '9123456', 'MMSI': mmsi, 'Flag': 'Panama', 'Size': '180 x 32 m',
+              'Latitude': f"{lat}° N", 'Longitude': f"{lon}° E", 'Speed': '0.3 kn', 'Course': '120°',
+              'Position Received': '2024-01-01 00:00 UTC'}
+    rows = ''.join(f"<tr><td>{label}</td><td>{value}</td></tr>" for label, value in fields.items())
+    return f"<html><body><table>{rows}</table></body></html>"
+
+
+def start_stub_service():
+    """Serves the area feed and vessel pages for SHIPS on a local port. :return: the StubService"""
+    feed = ['\t'.join([name, kind, mmsi, '0', str(lat), str(lon)]) for name, kind, mmsi, lat, lon in SHIPS]
+    return StubService(feed, {mmsi: vessel_page(mmsi, lat, lon) for _, _, mmsi, lat, lon in SHIPS})
+
+
+def prepare_run(directory):
+    """Fresh run directory with loose pages and the vessels.json of SHIPS, as left behind by earlier versions."""
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory)
+    sys.path.insert(0, ROOT)
+    from extractor import extract_ship_data
+    vessels = {}
+    for _, _, mmsi, lat, lon in SHIPS:
+        html = vessel_page(mmsi, lat, lon)
+        with open(os.path.join(directory, f"{mmsi}.html"), 'w', encoding='utf-8') as file:
+            file.write(html)
+        vessels[mmsi] = extract_ship_data(html)
+    with open(os.path.join(directory, 'vessels.json'), 'w', encoding='utf-8') as file:
+        json.dump(vessels, file, indent=4)
+
+
+def import_seconds(stderr):
+    """Total of the top-level imports in python -X importtime output."""
+    total = 0
+    for match in IMPORT_LINE.finditer(stderr):
+        if len(match.group(3)) == 1:
+            total += int(match.group(2))
+    return total / 1e6
+
+
+def run_command(arguments, workdir, base_url):
+    command = [sys.executable, '-X', 'importtime', os.path.join(ROOT, 'cli.py'),
+               '--base-url', base_url, '--no-cache', '--rate-limit', '0', *arguments]
+    started = time.perf_counter()
+    result = subprocess.run(command, cwd=workdir, capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f"{' '.join(arguments)} failed:\n{result.stdout}\n{result.stderr[-2000:]}")
+    return wall, import_seconds(result.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Kaltstartzeit der cli.py-Unterbefehle.")
+    parser.add_argument('--repeat', type=int, default=5, help="Läufe je Unterbefehl, berichtet wird der Median (Standard: 5)")
+    parser.add_argument('--output', help="JSON-Datei für die Ergebnisse")
+    parser.add_argument('commands', nargs='*', help=f"Zu messende Unterbefehle (Standard: {', '.join(COMMANDS)})")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.commands if name not in COMMANDS]
+    if unknown:
+        parser.error(f"Unbekannte Unterbefehle: {', '.join(unknown)}")
+
+    stub = start_stub_service()
+    base_url = stub.url
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        run_command(['--help'], workdir, base_url)
+        for name in args.commands or COMMANDS:
+            walls, imports = [], []
+            for _ in range(args.repeat):
+                prepare_run(os.path.join(workdir, RUN))
+                wall, imported = run_command(COMMANDS[name], workdir, base_url)
+                walls.append(wall)
+                imports.append(imported)
+            results[name] = {'wall_s': round(statistics.median(walls), 3), 'import_s': round(statistics.median(imports), 3)}
+            print(f"{name:<12} {results[name]['wall_s'] * 1000:8.0f} ms gesamt, davon {results[name]['import_s'] * 1000:5.0f} ms Importe")
+    stub.close()
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({'python': sys.version.split()[0], 'repeat': args.repeat, 'commands': results}, file, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""
+Times the hot paths of the analyzer on fixed inputs of 100, 1k and 10k ships.
+
+Stages:
+    parse    parse_area_feed and area_mask of a vesselsonmap feed
+    scan     get_ships_in_area against the local stub service, including tiling and HTTP
+    extract  extract_ship_data of vessel pages
+    fields   the BeautifulSoup path (get_ship_data_field and table extraction), at most one pass over the pages
+    fetch    fetch_all_ship_data against the local stub service
+    pair     pair_nearby_ships of a vessels.json, including the paired_ships.xlsx export
+    export   convert_json_to_excel of a vessels.json
+
+    python benchmarks/run.py [--sizes 100,1000,10000] [--stages parse,pair] [--output report.json] [--compare baseline.json]
+
+With --compare the run exits with 1 if a stage got slower than the baseline by more than --threshold.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import fixtures
+from stub_server import StubService
+
+sys.path.insert(0, fixtures.ROOT)
+from extractor import FIELDS, extract_ship_data
+from program import ShipDataAnalyzer
+
+
+def analyzer_for(base_url=None):
+    """Analyzer without page cache, snapshot store and rate limit, so only the measured code runs."""
+    if base_url:
+        return ShipDataAnalyzer(rate_limit=0, base_url=base_url, cache_directory=None, store_path=None)
+    return ShipDataAnalyzer(rate_limit=0, cache_directory=None, store_path=None)
+
+
+@contextlib.contextmanager
+def parse_stage(context, size):
+    lines, bbox = fixtures.feed(size)
+    analyzer = analyzer_for()
+    selected_area = analyzer.area_from_bbox(*bbox)
+
+    def run():
+        feed = analyzer.parse_area_feed(lines)
+        analyzer.area_mask(selected_area, feed['lat'], feed['lon'])
+    yield len(lines), run
+
+
+@contextlib.contextmanager
+def scan_stage(context, size):
+    lines, bbox = fixtures.feed(size)
+    stub = StubService(lines)
+    analyzer = analyzer_for(stub.url)
+    selected_area = analyzer.area_from_bbox(*bbox)
+    try:
+        yield len(lines), lambda: analyzer.get_ships_in_area(selected_area)
+    finally:
+        analyzer.client.close()
+        stub.close()
+
+
+@contextlib.contextmanager
+def extract_stage(context, size):
+    pages = context['pages']
+
+    def run():
+        for index in range(size):
+            extract_ship_data(pages[index % len(pages)])
+    yield size, run
+
+
+@contextlib.contextmanager
+def fields_stage(context, size):
+    try:
+        from bs4 import BeautifulSoup
+    except ImportError:
+        yield None
+        return
+    analyzer = analyzer_for()
+    pages = context['pages'][:size]
+
+    def run():
+        for html in pages:
+            soup = BeautifulSoup(html, 'html.parser')
+            for field in FIELDS:
+                analyzer.get_ship_data_field(soup, field)
+            analyzer.extract_most_visited_ports(soup)
+            analyzer.extract_last_trips(soup)
+            analyzer.extract_port_calls(soup)
+    yield len(pages), run
+
+
+@contextlib.contextmanager
+def fetch_stage(context, size):
+    ship_ids = [row[2] for row in fixtures.ship_rows(size)]
+    stub = StubService(default_pages=context['pages'])
+    analyzer = analyzer_for(stub.url)
+    directory = os.path.join(context['workdir'], f"fetch_{size}")
+    os.makedirs(directory, exist_ok=True)
+    try:
+        yield size, lambda: analyzer.fetch_all_ship_data(ship_ids, directory)
+    finally:
+        analyzer.client.close()
+        stub.close()
+
+
+@contextlib.contextmanager
+def pair_stage(context, size):
+    directory = run_directory(context, size)
+    analyzer = analyzer_for()
+    yield size, lambda: analyzer.pair_nearby_ships(directory)
+
+
+@contextlib.contextmanager
+def export_stage(context, size):
+    directory = run_directory(context, size)
+    analyzer = analyzer_for()
+    yield size, lambda: analyzer.convert_json_to_excel(os.path.join(directory, 'vessels.json'))
+
+
+STAGES = {
+    'parse': parse_stage,
+    'scan': scan_stage,
+    'extract': extract_stage,
+    'fields': fields_stage,
+    'fetch': fetch_stage,
+    'pair': pair_stage,
+    'export': export_stage,
+}
+# Stages that also run on the recorded feed
+FEED_STAGES = ('parse', 'scan')
+# Differences below this many seconds are timer noise and never count as a regression
+NOISE_FLOOR = 0.005
+
+
+def run_directory(context, size):
+    """Run directory with the vessels.json fixture of size, shared by the pair and export stages."""
+    directory = os.path.join(context['workdir'], f"run_{size}")
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+        with open(os.path.join(directory, 'vessels.json'), 'w', encoding='utf-8') as file:
+            json.dump(fixtures.vessels(size), file, indent=4)
+    return directory
+
+
+def measure(run, repeat):
+    """:return: list of wall times in seconds, after one warm-up run"""
+    times = []
+    for index in range(repeat + 1):
+        with contextlib.redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - started
+        if index:
+            times.append(elapsed)
+    return times
+
+
+def git_commit():
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=fixtures.ROOT, capture_output=True, text=True)
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+
+def compare(results, baseline_path, threshold):
+    """Prints the change against a baseline report. :return: list of (stage, size) that got slower than threshold"""
+    with open(baseline_path, 'r', encoding='utf-8') as file:
+        baseline = {(result['stage'], str(result['size'])): result for result in json.load(file)['results']}
+    regressions = []
+    for result in results:
+        previous = baseline.get((result['stage'], str(result['size'])))
+        if not previous or not previous['median_s']:
+            continue
+        change = result['median_s'] / previous['median_s'] - 1
+        marker = ''
+        if change > threshold and result['median_s'] - previous['median_s'] > NOISE_FLOOR:
+            regressions.append((result['stage'], result['size']))
+            marker = '  <-- langsamer'
+        print(f"{result['stage']:<8} {result['size']!s:>8} {previous['median_s'] * 1000:10.1f} ms -> "
+              f"{result['median_s'] * 1000:10.1f} ms {change:+7.1%}{marker}")
+    return regressions
+
+
+def size_list(value):
+    sizes = []
+    for item in value.split(','):
+        item = item.strip()
+        if item == 'recorded' or item.isdigit():
+            sizes.append(item if item == 'recorded' else int(item))
+        elif item:
+            raise argparse.ArgumentTypeError(f"Ungültige Größe: {item}")
+    return sizes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Laufzeiten der Verarbeitungsschritte auf festen Eingaben.")
+    parser.add_argument('--sizes', type=size_list, default=list(fixtures.SIZES),
+                        help="Anzahl der Schiffe, durch Kommas getrennt; 'recorded' misst den aufgezeichneten Feed (Standard: 100,1000,10000)")
+    parser.add_argument('--stages', default=','.join(STAGES), help=f"Zu messende Schritte (Standard: {','.join(STAGES)})")
+    parser.add_argument('--repeat', type=int, default=3, help="Läufe je Schritt und Größe, berichtet wird der Median (Standard: 3)")
+    parser.add_argument('--output', help="JSON-Datei für den Bericht")
+    parser.add_argument('--compare', help="Früherer Bericht, mit dem verglichen wird")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Erlaubte Verlangsamung gegenüber --compare (Standard: 0.2 = 20 %%)")
+    args = parser.parse_args(argv)
+    stages = [stage.strip() for stage in args.stages.split(',') if stage.strip()]
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        parser.error(f"Unbekannte Schritte: {', '.join(unknown)}")
+    if 'recorded' in args.sizes and not fixtures.has_recorded_feed():
+        parser.error(f"Keine aufgezeichneten Eingaben in {fixtures.RECORDED_DIRECTORY}; zuerst "
+                     "'python benchmarks/fixtures.py record --bbox MINLON MINLAT MAXLON MAXLAT' ausführen.")
+
+    pages_kind, pages = fixtures.load_pages()
+    context = {'pages': pages}
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        context['workdir'] = workdir
+        for stage in stages:
+            for size in args.sizes:
+                if size == 'recorded' and stage not in FEED_STAGES:
+                    continue
+                with STAGES[stage](context, size) as measured:
+                    if measured is None:
+                        print(f"{stage:<8} übersprungen, BeautifulSoup ist nicht installiert.")
+                        break
+                    items, run = measured
+                    times = measure(run, args.repeat)
+                median = statistics.median(times)
+                results.append({'stage': stage, 'size': size, 'items': items, 'median_s': round(median, 6),
+                                'min_s': round(min(times), 6), 'per_item_us': round(median / max(items, 1) * 1e6, 2)})
+                print(f"{stage:<8} {size!s:>8} {median * 1000:10.1f} ms  ({results[-1]['per_item_us']:.1f} µs je Element)")
+
+    if args.output:
+        report = {'created': datetime.now(timezone.utc).isoformat(timespec='seconds'), 'commit': git_commit(),
+                  'python': sys.version.split()[0], 'platform': platform.platform(), 'cpus': os.cpu_count(),
+                  'repeat': args.repeat, 'pages': pages_kind, 'results': results}
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=4)
+        print(f"Bericht in {args.output} gespeichert.")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} Schritte sind langsamer als erlaubt.")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
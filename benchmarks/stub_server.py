@@ -0,0 +1,91 @@
+"""
+Local stand-in for myshiptracking.com: serves a vesselsonmap feed filtered by the requested bounding box
+and a vessel page for every MMSI, so benchmarks and smoke runs never touch the live site.
+"""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+FEED_PATH = '/requests/'
+VESSEL_PATH = '/vessels/'
+
+
+class StubService:
+    """
+    :param feed_lines: tab separated feed lines (name, type, MMSI, unused, lat, lon)
+    :param pages: dict of MMSI -> page HTML; MMSIs without a page get one of default_pages
+    :param default_pages: pages handed out round robin by MMSI, e.g. fixtures.synthetic_pages()
+    :param latency: seconds to wait before answering, to mimic a remote server
+    """
+
+    def __init__(self, feed_lines=(), pages=None, default_pages=(), latency=0.0, host='127.0.0.1', port=0):
+        self.feed = []
+        for line in feed_lines:
+            fields = line.split('\t')
+            self.feed.append((float(fields[4]), float(fields[5]), line.encode('utf-8')))
+        self.pages = {mmsi: html.encode('utf-8') for mmsi, html in (pages or {}).items()}
+        self.default_pages = [html.encode('utf-8') for html in default_pages]
+        self.latency = latency
+        self.requests = 0
+        self.server = ThreadingHTTPServer((host, port), self.handler_class())
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def feed_body(self, query):
+        """Feed lines inside the minlat/maxlat/minlon/maxlon of the query, like the live service."""
+        try:
+            minlat, maxlat = float(query['minlat'][0]), float(query['maxlat'][0])
+            minlon, maxlon = float(query['minlon'][0]), float(query['maxlon'][0])
+        except (KeyError, ValueError):
+            return b''
+        return b'\n'.join(line for lat, lon, line in self.feed if minlat <= lat <= maxlat and minlon <= lon <= maxlon)
+
+    def page_body(self, path):
+        mmsi = path[len(VESSEL_PATH):].split('-')[0]
+        if mmsi in self.pages:
+            return self.pages[mmsi]
+        if self.default_pages and mmsi.isdigit():
+            return self.default_pages[int(mmsi) % len(self.default_pages)]
+        return None
+
+    def handler_class(self):
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                service.requests += 1
+                if service.latency:
+                    time.sleep(service.latency)
+                url = urlsplit(self.path)
+                if url.path.startswith(FEED_PATH):
+                    body = service.feed_body(parse_qs(url.query))
+                elif url.path.startswith(VESSEL_PATH):
+                    body = service.page_body(url.path)
+                else:
+                    body = None
+                if body is None:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,225 @@
+import argparse
+import json
+import os
+import sys
+
+
+def main(argv=None):
+    """
+    Non-interactive entry point for scripted and scheduled runs, e.g.
+    python cli.py fetch --bbox 23.5 37.8 23.8 38.0
+    :return: exit code
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not args.command:
+        parser.print_help()
+        return 2
+
+    # Imported after parsing, so --help and argument errors stay instant
+    from program import BASE_URL, CACHE_DIRECTORY, STORE_FILE, ShipDataAnalyzer
+    analyzer = ShipDataAnalyzer(max_workers=args.workers, rate_limit=args.rate_limit, base_url=args.base_url or BASE_URL,
+                                cache_directory=None if args.no_cache else CACHE_DIRECTORY,
+                                store_path=None if args.no_store else STORE_FILE,
+                                metrics=args.metrics or args.prometheus)
+    try:
+        return args.handler(analyzer, args) or 0
+    finally:
+        # Commands on an existing run report into it, fetch and watch into the run they created
+        directory = getattr(args, 'directory', None) or analyzer.run_directory
+        if directory and os.path.isdir(directory):
+            analyzer.save_metrics(directory, args.prometheus)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='cli.py', description="Schiffsdaten-Analyse ohne interaktives Menü.")
+    parser.add_argument('--workers', type=int, default=8, help="Gleichzeitige Anfragen (Standard: 8)")
+    parser.add_argument('--rate-limit', type=float, default=5.0, help="Anfragen pro Sekunde und Host (Standard: 5)")
+    parser.add_argument('--no-cache', action='store_true', help="Schiffsseiten immer neu herunterladen")
+    parser.add_argument('--base-url', default=None, help="Basis-URL des Dienstes, z. B. für einen Spiegel oder Testserver")
+    parser.add_argument('--no-store', action='store_true', help="Läufe nicht in snapshots.sqlite aufzeichnen")
+    parser.add_argument('--metrics', action='store_true', help="Laufzeiten und HTTP-Messwerte in metrics.json des Laufverzeichnisses speichern")
+    parser.add_argument('--prometheus', action='store_true', help="Wie --metrics, zusätzlich metrics.prom im Prometheus-Textformat")
+    commands = parser.add_subparsers(dest='command')
+
+    scan = commands.add_parser('scan', help="Schiffe im Gebiet auflisten")
+    add_area_arguments(scan)
+    scan.add_argument('--output', help="JSON-Datei für das Ergebnis, ohne Angabe auf die Standardausgabe")
+    scan.set_defaults(handler=scan_area)
+
+    fetch = commands.add_parser('fetch', help="Schiffsdaten im Gebiet herunterladen und speichern")
+    add_area_arguments(fetch)
+    fetch.set_defaults(handler=fetch_area)
+
+    process = commands.add_parser('process', help="Gespeicherte Schiffsseiten erneut einlesen")
+    process.add_argument('directory', help="Laufverzeichnis oder Verzeichnis mit mehreren Läufen")
+    process.add_argument('--processes', type=int, default=None, help="Anzahl der Prozesse (Standard: alle CPUs)")
+    process.add_argument('--full', action='store_true', help="Alle Dateien neu einlesen statt nur geänderter")
+    process.set_defaults(handler=process_directory)
+
+    migrate = commands.add_parser('migrate', help="Einzelne HTML-Dateien älterer Läufe in Seitenarchive überführen")
+    migrate.add_argument('directory', help="Laufverzeichnis oder Verzeichnis mit mehreren Läufen")
+    migrate.set_defaults(handler=migrate_pages)
+
+    pair = commands.add_parser('pair', help="Nahegelegene Schiffe paaren")
+    pair.add_argument('directory')
+    pair.add_argument('--distance', type=float, default=75, help="Abstandsschwellenwert in Metern (Standard: 75)")
+    pair.add_argument('--speed', type=float, default=None, help="Geschwindigkeitsschwellenwert in Knoten")
+    add_export_arguments(pair)
+    pair.set_defaults(handler=pair_ships)
+
+    fleet = commands.add_parser('map', help="Flottenkarte mit allen Schiffen und Paaren eines Laufs erstellen")
+    fleet.add_argument('directory')
+    fleet.add_argument('--distance', type=float, default=75, help="Abstandsschwellenwert für Paare in Metern (Standard: 75)")
+    fleet.add_argument('--speed', type=float, default=None, help="Geschwindigkeitsschwellenwert für Paare in Knoten")
+    fleet.set_defaults(handler=create_fleet_map)
+
+    export = commands.add_parser('export', help="vessels.json als Tabelle exportieren")
+    export.add_argument('directory')
+    add_export_arguments(export)
+    export.add_argument('--exclude', type=column_list, default=None, help="Auszulassende Spalten, durch Kommas getrennt")
+    export.set_defaults(handler=export_vessels)
+
+    clean = commands.add_parser('clean', help="Ungültige Schiffe aus einem Lauf entfernen")
+    clean.add_argument('directory')
+    clean.set_defaults(handler=clean_directory)
+
+    watch = commands.add_parser('watch', help="Gebiet überwachen und Änderungen melden")
+    add_area_arguments(watch)
+    watch.add_argument('--interval', type=float, default=300, help="Sekunden zwischen zwei Abfragen (Standard: 300)")
+    watch.add_argument('--move-threshold', type=float, default=500, help="Bewegung in Metern, ab der Details neu geladen werden (Standard: 500)")
+    watch.add_argument('--distance', type=float, default=75, help="Abstandsschwellenwert für Paare in Metern (Standard: 75)")
+    watch.add_argument('--speed', type=float, default=None, help="Geschwindigkeitsschwellenwert für Paare in Knoten")
+    watch.add_argument('--rendezvous-hours', type=float, default=None,
+                       help="Meldet Schiffspaare, die mindestens so viele Stunden langsam beieinander liegen")
+    watch.add_argument('--rendezvous-distance', type=float, default=500, help="Abstand in Metern für Treffen (Standard: 500)")
+    watch.add_argument('--cycles', type=int, default=None, help="Anzahl der Abfragen, ohne Angabe bis zum Abbruch")
+    watch.set_defaults(handler=watch_area)
+
+    rendezvous = commands.add_parser('rendezvous', help="Treffen über alle aufgezeichneten Läufe suchen")
+    rendezvous.add_argument('directory', help="Verzeichnis für rendezvous.xlsx")
+    rendezvous.add_argument('--distance', type=float, default=500, help="Abstand in Metern (Standard: 500)")
+    rendezvous.add_argument('--speed', type=float, default=2.0, help="Höchstgeschwindigkeit in Knoten (Standard: 2)")
+    rendezvous.add_argument('--hours', type=float, default=2.0, help="Mindestdauer in Stunden (Standard: 2)")
+    rendezvous.set_defaults(handler=find_rendezvous)
+
+    ports = commands.add_parser('ports', help="Häfen, die Schiffe aus dem Gebiet eines Laufs angelaufen haben")
+    ports.add_argument('directory', help="Laufverzeichnis, dessen selected_area.geojson das Gebiet vorgibt")
+    ports.add_argument('--days', type=float, default=90, help="Zeitraum in Tagen (Standard: 90)")
+    ports.add_argument('--format', choices=['xlsx', 'csv', 'parquet'], default='xlsx', help="Exportformat (Standard: xlsx)")
+    ports.set_defaults(handler=port_report)
+    return parser
+
+
+def add_area_arguments(parser):
+    area = parser.add_mutually_exclusive_group(required=True)
+    area.add_argument('--geojson', help="GeoJSON-Datei des Gebiets, z. B. selected_area.geojson eines früheren Laufs")
+    area.add_argument('--bbox', type=float, nargs=4, metavar=('MINLON', 'MINLAT', 'MAXLON', 'MAXLAT'), help="Rechteck in Grad")
+    area.add_argument('--circle', type=float, nargs=3, metavar=('LON', 'LAT', 'RADIUS_KM'), help="Kreis um einen Punkt")
+    area.add_argument('--select', action='store_true', help="Gebiet im Browser auswählen")
+
+
+def add_export_arguments(parser):
+    parser.add_argument('--columns', type=column_list, default=None, help="Spalten je Schiff, durch Kommas getrennt (Standard: alle)")
+    parser.add_argument('--format', choices=['xlsx', 'csv', 'parquet'], default='xlsx', help="Exportformat (Standard: xlsx)")
+
+
+def column_list(value):
+    return [column.strip() for column in value.split(',') if column.strip()]
+
+
+def load_area(analyzer, args):
+    if args.geojson:
+        return analyzer.area_from_file(args.geojson)
+    if args.bbox:
+        return analyzer.area_from_bbox(*args.bbox)
+    if args.circle:
+        return analyzer.area_from_circle(*args.circle)
+    analyzer.open_html_page()
+    print("Bitte wählen Sie einen Bereich auf der Karte aus und klicken Sie auf 'Bestätigen'.")
+    return analyzer.load_data()
+
+
+def scan_area(analyzer, args):
+    selected_area = load_area(analyzer, args)
+    if not selected_area:
+        return 1
+    ships = analyzer.get_ships_in_area(selected_area)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(ships, file, indent=4)
+        print(f"{len(ships)} Schiffe in {args.output} gespeichert.")
+    else:
+        json.dump(ships, sys.stdout, indent=4)
+        print()
+
+
+def fetch_area(analyzer, args):
+    selected_area = load_area(analyzer, args)
+    if not selected_area:
+        return 1
+    ships = analyzer.get_ships_in_area(selected_area)
+    directory = analyzer.setup_directory(selected_area)
+    vessels = analyzer.fetch_all_ship_data(ships, directory)
+    json_file_path = analyzer.save_vessels(directory, vessels.items())
+    print(f"Schiffsdaten wurden in {json_file_path} gespeichert.")
+
+
+def process_directory(analyzer, args):
+    analyzer.process_html_files_in_directory(args.directory, args.processes, incremental=not args.full)
+
+
+def migrate_pages(analyzer, args):
+    analyzer.migrate_pages(args.directory)
+
+
+def pair_ships(analyzer, args):
+    analyzer.pair_nearby_ships(args.directory, args.distance, args.speed, args.columns, args.format)
+
+
+def create_fleet_map(analyzer, args):
+    analyzer.create_fleet_map(args.directory, distance_threshold=args.distance, speed_threshold=args.speed)
+
+
+def export_vessels(analyzer, args):
+    analyzer.convert_json_to_excel(os.path.join(args.directory, "vessels.json"), args.columns, args.exclude, args.format)
+
+
+def clean_directory(analyzer, args):
+    analyzer.clean_directory(args.directory)
+
+
+def watch_area(analyzer, args):
+    from rendezvous import RendezvousDetector
+    from watch import AreaWatcher
+
+    selected_area = load_area(analyzer, args)
+    if not selected_area:
+        return 1
+    directory = analyzer.setup_directory(selected_area)
+    print(f"Überwache Gebiet, Ergebnisse in {directory}")
+    rendezvous = None
+    if args.rendezvous_hours:
+        rendezvous = RendezvousDetector(args.rendezvous_distance, args.speed or 2.0, args.rendezvous_hours * 3600,
+                                        max_gap=max(3600, 3 * args.interval),
+                                        max_lat=max(abs(selected_area['minlat']), abs(selected_area['maxlat'])))
+    AreaWatcher(analyzer, selected_area, directory, args.interval, args.move_threshold,
+                args.distance, args.speed, rendezvous=rendezvous).run(args.cycles)
+
+
+def find_rendezvous(analyzer, args):
+    if not analyzer.store:
+        print("Treffen werden aus snapshots.sqlite gesucht, --no-store ist dafür nicht möglich.")
+        return 1
+    analyzer.detect_rendezvous(args.directory, args.distance, args.speed, args.hours)
+
+
+def port_report(analyzer, args):
+    if not analyzer.store:
+        print("Hafenanläufe werden aus snapshots.sqlite ausgewertet, --no-store ist dafür nicht möglich.")
+        return 1
+    analyzer.port_report(args.directory, args.days, args.format)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+import csv
+import json
+import os
+
+from extractor import FIELDS, TABLES
+
+# Columns of a vessel table, in the order of vessels.json
+VESSEL_COLUMNS = ['ship_id', *FIELDS, *TABLES]
+
+# Rows buffered per Parquet row group
+PARQUET_BATCH_SIZE = 10000
+
+
+def cell_value(value):
+    """Tables and other nested values are written as JSON text, everything else as is."""
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def select_columns(columns=None, exclude=None):
+    """
+    :param columns: columns to export in this order, all VESSEL_COLUMNS if None
+    :param exclude: columns to leave out
+    """
+    columns = list(columns or VESSEL_COLUMNS)
+    unknown = [column for column in columns if column not in VESSEL_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unbekannte Spalten: {', '.join(unknown)}")
+    return [column for column in columns if column not in set(exclude or ())]
+
+
+def vessel_rows(ships, columns):
+    """:param ships: iterable of (ship_id, ship_data) pairs"""
+    for ship_id, ship_data in ships:
+        yield [ship_id if column == 'ship_id' else cell_value(ship_data.get(column)) for column in columns]
+
+
+def pair_columns(columns):
+    return ['distance_m'] + [f"ship1_{column}" for column in columns] + [f"ship2_{column}" for column in columns]
+
+
+def pair_rows(pairs, data, columns):
+    """
+    One flat row per pair: the distance followed by the selected columns of both ships.
+    :param pairs: iterable of (ship_id1, ship_id2, distance)
+    :param data: vessels dict the ship ids refer to
+    """
+    for ship_id1, ship_id2, distance in pairs:
+        row = [round(distance, 2)]
+        for ship_id in (ship_id1, ship_id2):
+            ship_data = data[ship_id]
+            row.extend(ship_id if column == 'ship_id' else cell_value(ship_data.get(column)) for column in columns)
+        yield row
+
+
+def write_rows(path, header, rows):
+    """
+    Streams rows into an .xlsx, .csv or .parquet file, chosen by the extension of path.
+    Memory use does not grow with the number of rows.
+    :return: number of rows written
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.xlsx':
+        return write_xlsx(path, header, rows)
+    if extension == '.csv':
+        return write_csv(path, header, rows)
+    if extension == '.parquet':
+        return write_parquet(path, header, rows)
+    raise ValueError(f"Unbekanntes Exportformat: {extension}")
+
+
+def write_xlsx(path, header, rows):
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(header)
+    count = 0
+    for row in rows:
+        sheet.append(row)
+        count += 1
+    workbook.save(path)
+    return count
+
+
+def write_csv(path, header, rows):
+    count = 0
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(header)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def write_parquet(path, header, rows):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Für den Parquet-Export wird pyarrow benötigt (pip install pyarrow).")
+
+    schema = pa.schema([(column, pa.string()) for column in header])
+    count = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == PARQUET_BATCH_SIZE:
+                writer.write_table(parquet_table(pa, schema, header, batch))
+                count += len(batch)
+                batch = []
+        if batch:
+            writer.write_table(parquet_table(pa, schema, header, batch))
+            count += len(batch)
+    return count
+
+
+def parquet_table(pa, schema, header, batch):
+    columns = [[None if row[i] is None else str(row[i]) for row in batch] for i in range(len(header))]
+    return pa.Table.from_arrays([pa.array(column, pa.string()) for column in columns], schema=schema)
@@ -0,0 +1,223 @@
+from collections import Counter
+from html.parser import HTMLParser
+
+FIELDS = ["Type", "IMO", "MMSI", "Flag", "Call Sign", "Size", "GT", "DWT", "Build", "Longitude", "Latitude", "Status", "Speed", "Course", "Area", "Station", "Position Received", "Trip Time", "Trip Distance", "Average Speed", "Maximum Speed", "Draught"]
+
+# Output key -> (id of the surrounding div, column names)
+TABLES = {
+    'Most Visited Ports': ('ft-visitedports', ['port', 'arrivals']),
+    'Last Trips': ('ft-lasttrips', ['origin', 'departure', 'destination', 'arrival', 'distance']),
+    'Port Calls': ('ft-portcalls', ['port', 'arrival', 'departure', 'time_in_port']),
+}
+
+TABLE_CLASS = 'myst-table'
+
+# Fields whose hemisphere letter becomes the sign of the value
+COORDINATE_FIELDS = frozenset(['Latitude', 'Longitude'])
+
+# Bump whenever the extracted output changes, so incremental runs re-parse every page
+EXTRACTOR_VERSION = 2
+
+# Tree building rules of BeautifulSoup's html.parser builder, so values come out identical
+VOID_ELEMENTS = frozenset(['area', 'base', 'basefont', 'bgsound', 'br', 'col', 'command', 'embed', 'frame', 'hr', 'image', 'img', 'input', 'isindex', 'keygen', 'link', 'menuitem', 'meta', 'nextid', 'param', 'source', 'spacer', 'track', 'wbr'])
+PRESERVE_WHITESPACE = frozenset(['pre', 'textarea'])
+# Text inside these tags is not part of an element's .text
+STRING_CONTAINERS = frozenset(['rt', 'rp', 'style', 'script', 'template'])
+ASCII_SPACES = '\x20\x0a\x09\x0c\x0d'
+
+
+def clean_field_value(text, coordinate=False):
+    """
+    :param coordinate: turn a trailing N/S/E/W into the sign of the value, e.g. '12.5° S' into '-12.5';
+        other fields keep their letters
+    """
+    value = text.strip().replace('°', '')
+    if coordinate and value[-1:] in ('N', 'S', 'E', 'W'):
+        value = ('-' if value[-1] in ('S', 'W') else '') + value[:-1].strip()
+    value = ''.join(c for c in value if c.isprintable())
+    return value if value else "Nicht verfügbar"
+
+
+class VesselPageParser(HTMLParser):
+    """
+    Collects all label/value fields and the port and trip tables of a vessel page in a single
+    streaming pass, without building a document tree.
+
+    A field value is the text of the first <td> following the first string equal to the label,
+    a table is the first table.myst-table inside the div with the section id.
+    """
+
+    def __init__(self, fields=FIELDS, tables=TABLES):
+        super().__init__(convert_charrefs=True)
+        self.stack = []
+        self.closers = {}
+        self.data = []
+        self.preserve_depth = 0
+        self.container_depth = 0
+        self.texts = {}
+        self.pending_labels = set(fields)
+        self.waiting_labels = []
+        self.labels = {}
+        self.sections = {section_id: None for section_id, _ in tables.values()}
+        self.table_rows = {section_id: [] for section_id in self.sections}
+        self.open_rows = {}
+        self.open_tables = {}
+        self.closed_void_elements = Counter()
+
+    def handle_starttag(self, tag, attrs):
+        self.flush()
+        attrs = {key: value if value is not None else "" for key, value in attrs}
+        self.stack.append(tag)
+        depth = len(self.stack)
+        if tag in PRESERVE_WHITESPACE:
+            self.preserve_depth += 1
+            self.on_close(depth, self.leave_preserve)
+        if tag in STRING_CONTAINERS:
+            self.container_depth += 1
+            self.on_close(depth, self.leave_container)
+
+        if tag == 'div':
+            section_id = attrs.get('id')
+            if section_id in self.sections and self.sections[section_id] is None:
+                self.sections[section_id] = 'open'
+                self.on_close(depth, lambda: self.close_section(section_id))
+        elif tag == 'table' and TABLE_CLASS in attrs.get('class', '').split():
+            section_ids = [section_id for section_id, state in self.sections.items() if state == 'open']
+            if section_ids:
+                for section_id in section_ids:
+                    self.sections[section_id] = 'done'
+                self.open_tables[depth] = section_ids
+                self.on_close(depth, lambda: self.open_tables.pop(depth))
+        elif tag == 'tr' and self.open_tables:
+            row = []
+            for section_ids in self.open_tables.values():
+                for section_id in section_ids:
+                    self.table_rows[section_id].append(row)
+            self.open_rows[depth] = row
+            self.on_close(depth, lambda: self.open_rows.pop(depth))
+        elif tag == 'td' and (self.waiting_labels or self.open_rows):
+            text = self.capture(depth)
+            for label in self.waiting_labels:
+                self.labels[label] = text
+            self.waiting_labels = []
+            for row in self.open_rows.values():
+                row.append(text)
+
+        if tag in VOID_ELEMENTS:
+            self.pop_to(tag)
+            self.closed_void_elements[tag] += 1
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag in VOID_ELEMENTS:
+            # <br/> has no redundant end tag to swallow later
+            self.closed_void_elements[tag] -= 1
+        else:
+            self.pop_to(tag)
+
+    def handle_endtag(self, tag):
+        if self.closed_void_elements[tag] > 0:
+            # A redundant end tag like </br> does not even end the current string
+            self.closed_void_elements[tag] -= 1
+            return
+        self.flush()
+        self.pop_to(tag)
+
+    def handle_data(self, data):
+        self.data.append(data)
+
+    def handle_comment(self, data):
+        self.flush()
+        self.match_label(data)
+
+    def handle_decl(self, decl):
+        self.flush()
+
+    def handle_pi(self, data):
+        self.flush()
+
+    def unknown_decl(self, data):
+        self.flush()
+
+    def close(self):
+        super().close()
+        self.flush()
+        while self.stack:
+            self.pop()
+
+    def flush(self):
+        if not self.data:
+            return
+        text = ''.join(self.data)
+        self.data = []
+        if not self.preserve_depth and not text.strip(ASCII_SPACES):
+            text = '\n' if '\n' in text else ' '
+        self.match_label(text)
+        if not self.container_depth:
+            for parts in self.texts.values():
+                parts.append(text)
+
+    def match_label(self, text):
+        if text in self.pending_labels:
+            self.pending_labels.remove(text)
+            self.waiting_labels.append(text)
+
+    def capture(self, depth):
+        parts = self.texts[depth] = []
+        self.on_close(depth, lambda: self.texts.pop(depth))
+        return parts
+
+    def on_close(self, depth, callback):
+        self.closers.setdefault(depth, []).append(callback)
+
+    def pop(self):
+        depth = len(self.stack)
+        self.stack.pop()
+        for callback in self.closers.pop(depth, ()):
+            callback()
+
+    def pop_to(self, tag):
+        if tag not in self.stack:
+            return
+        while self.stack:
+            if self.stack[-1] == tag:
+                self.pop()
+                break
+            self.pop()
+
+    def leave_preserve(self):
+        self.preserve_depth -= 1
+
+    def leave_container(self):
+        self.container_depth -= 1
+
+    def close_section(self, section_id):
+        self.sections[section_id] = 'done'
+
+    def field(self, label):
+        parts = self.labels.get(label)
+        if parts is None:
+            return "Nicht verfügbar"
+        return clean_field_value(''.join(parts), label in COORDINATE_FIELDS)
+
+    def table(self, section_id, columns):
+        data = []
+        for row in self.table_rows[section_id][1:]:
+            if len(row) >= len(columns):
+                data.append({columns[i]: ''.join(row[i]).strip() for i in range(len(columns))})
+        return data
+
+
+def extract_ship_data(html_content):
+    """
+    Extracts all fields and tables of a vessel page in one pass.
+    :param html_content: HTML of a myshiptracking.com vessel page
+    :return: dict with one entry per FIELDS label followed by the TABLES entries
+    """
+    parser = VesselPageParser()
+    parser.feed(html_content)
+    parser.close()
+    ship_data = {field: parser.field(field) for field in FIELDS}
+    for key, (section_id, columns) in TABLES.items():
+        ship_data[key] = parser.table(section_id, columns)
+    return ship_data
@@ -0,0 +1,138 @@
+import json
+
+import folium
+import numpy as np
+from folium import plugins
+from folium.map import Layer
+from folium.template import Template
+
+# Vessel types with a layer of their own, the remaining types share one
+MAX_TYPE_LAYERS = 12
+# Closest pairs drawn as lines, every line adds about 60 bytes to the page
+MAX_PAIR_LINES = 20000
+# About one meter, keeps the embedded coordinate arrays short
+COORDINATE_DIGITS = 5
+
+LAYER_COLORS = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b', '#e377c2',
+                '#7f7f7f', '#bcbd22', '#17becf', '#393b79', '#637939', '#843c39']
+PAIR_STYLE = {'color': '#d62728', 'weight': 2, 'opacity': 0.8}
+
+# Markers are created in the browser from rows of [lat, lon, MMSI, speed, flag]
+VESSEL_CALLBACK = """function (row) {
+    var marker = L.circleMarker(new L.LatLng(row[0], row[1]), {radius: 5, color: %(color)s, weight: 1, fillOpacity: 0.8});
+    marker.bindPopup(function () {
+        return '<b>MMSI ' + row[2] + '</b><br>' + %(type)s
+            + (row[3] === null ? '' : '<br>' + row[3] + ' kn')
+            + (row[4] === null ? '' : '<br>' + row[4]);
+    });
+    return marker;
+}"""
+
+
+class PairLines(Layer):
+    """
+    Connector lines between paired vessels, created in the browser from one array of
+    [lat1, lon1, lat2, lon2, MMSI1, MMSI2, distance] rows instead of one folium object per line.
+    """
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = (function(){
+                var data = {{ this.data|tojson }};
+                var group = L.featureGroup();
+                for (var i = 0; i < data.length; i++) {
+                    var row = data[i];
+                    L.polyline([[row[0], row[1]], [row[2], row[3]]], {{ this.style|tojson }})
+                        .bindTooltip(row[4] + ' / ' + row[5] + ': ' + row[6] + ' m')
+                        .addTo(group);
+                }
+                return group;
+            })();
+        {% endmacro %}""")
+
+    def __init__(self, data, name=None, style=None, overlay=True, control=True, show=True):
+        super().__init__(name=name, overlay=overlay, control=control, show=show)
+        self._name = 'PairLines'
+        self.data = data
+        self.style = style or PAIR_STYLE
+
+
+def type_layers(vessels, located):
+    """
+    Splits the located vessels by type, largest types first.
+    :return: list of (layer name, index array); types beyond MAX_TYPE_LAYERS share one layer
+    """
+    codes = vessels.column('type')[located]
+    counts = np.bincount(codes, minlength=len(vessels.categories['type']))
+    order = [code for code in np.argsort(-counts, kind='stable').tolist() if counts[code]]
+    layers = []
+    for code in order[:MAX_TYPE_LAYERS]:
+        layers.append((vessels.categories['type'][code] or "Unbekannt", located[codes == code]))
+    rest = order[MAX_TYPE_LAYERS:]
+    if rest:
+        layers.append(("Sonstige", located[np.isin(codes, rest)]))
+    return layers
+
+
+def vessel_rows(vessels, indices):
+    lat = np.round(vessels.column('lat')[indices], COORDINATE_DIGITS).tolist()
+    lon = np.round(vessels.column('lon')[indices], COORDINATE_DIGITS).tolist()
+    speed = vessels.column('speed')[indices]
+    speed = np.where(np.isnan(speed), None, speed).tolist()
+    flags = vessels.categories['flag']
+    flag_codes = vessels.column('flag')[indices].tolist()
+    ids = vessels.ids
+    return [[lat[i], lon[i], ids[index], speed[i], flags[flag_codes[i]]] for i, index in enumerate(indices.tolist())]
+
+
+def pair_rows(vessels, pairs, max_pairs):
+    """Rows for PairLines of the closest max_pairs pairs whose vessels both have a position."""
+    position = {ship_id: index for index, ship_id in enumerate(vessels.ids)}
+    lat, lon = vessels.column('lat'), vessels.column('lon')
+    rows = []
+    for ship_id1, ship_id2, distance in sorted(pairs, key=lambda pair: pair[2])[:max_pairs]:
+        i, j = position.get(ship_id1), position.get(ship_id2)
+        if i is None or j is None or np.isnan(lat[i]) or np.isnan(lat[j]):
+            continue
+        rows.append([round(float(lat[i]), COORDINATE_DIGITS), round(float(lon[i]), COORDINATE_DIGITS),
+                     round(float(lat[j]), COORDINATE_DIGITS), round(float(lon[j]), COORDINATE_DIGITS),
+                     ship_id1, ship_id2, round(distance, 1)])
+    return rows
+
+
+def fleet_map(vessels, pairs=(), selected_area=None, max_pairs=MAX_PAIR_LINES):
+    """
+    Map of a whole snapshot: one clustered layer per vessel type and a layer of pair lines.
+    Vessels and pairs are embedded as plain data arrays and only turned into markers and lines
+    in the browser, so page size and load time stay manageable for tens of thousands of vessels.
+    :param vessels: VesselTable of the snapshot
+    :param pairs: (ship_id1, ship_id2, distance) tuples as returned by PairingEngine.find_pairs
+    :param selected_area: outlined on the map if given
+    :return: (folium.Map, number of vessels drawn, number of pairs drawn)
+    """
+    lat, lon = vessels.column('lat'), vessels.column('lon')
+    located = np.flatnonzero(~np.isnan(lat) & ~np.isnan(lon))
+    m = folium.Map(tiles='OpenStreetMap', prefer_canvas=True)
+
+    if selected_area:
+        folium.GeoJson(selected_area['shape'], name="Ausgewählter Bereich",
+                       style_function=lambda feature: {'fill': False, 'color': '#3186cc', 'weight': 2}).add_to(m)
+
+    for number, (name, indices) in enumerate(type_layers(vessels, located)):
+        callback = VESSEL_CALLBACK % {'color': json.dumps(LAYER_COLORS[number % len(LAYER_COLORS)]),
+                                      'type': json.dumps(name)}
+        plugins.FastMarkerCluster(vessel_rows(vessels, indices), callback=callback, name=f"{name} ({len(indices)})",
+                                  chunkedLoading=True, disableClusteringAtZoom=15).add_to(m)
+
+    rows = pair_rows(vessels, pairs, max_pairs)
+    if rows:
+        PairLines(rows, name=f"Paare ({len(rows)})").add_to(m)
+
+    if len(located):
+        m.fit_bounds([[float(lat[located].min()), float(lon[located].min())],
+                      [float(lat[located].max()), float(lon[located].max())]])
+    elif selected_area:
+        m.fit_bounds([[selected_area['minlat'], selected_area['minlon']], [selected_area['maxlat'], selected_area['maxlon']]])
+    plugins.Fullscreen().add_to(m)
+    folium.LayerControl(collapsed=False).add_to(m)
+    return m, len(located), len(rows)
@@ -0,0 +1,116 @@
+from math import radians, cos, sin, sqrt, atan2
+
+import numpy as np
+
+EARTH_RADIUS = 6371000
+# Meters per degree of latitude on the sphere used by haversine
+METERS_PER_DEGREE = EARTH_RADIUS * 3.141592653589793 / 180
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
+    c = 2 * atan2(sqrt(a), sqrt(1-a))
+    return EARTH_RADIUS * c
+
+
+def parse_size(size):
+    """
+    Parses a size string as shown on the vessel page.
+    :param size: e.g. '180 x 32 m', '95 m', '---' or '0 m'
+    :return: (length, width) in meters
+    """
+    if size == '---' or size == '0 m':
+        size = '0 x 0'
+    size = size.replace(' m', '')
+    parts = size.split(' x ')
+    if len(parts) == 1:
+        length = float(parts[0])
+        width = 0
+    else:
+        length, width = map(float, parts)
+    return length, width
+
+
+def rectangle_distance(lat1, lon1, length1, width1, lat2, lon2, length2, width2):
+    """
+    Calculates the minimal corner distance between two rectangles representing ships.
+    :param lat1, lon1: center of the first ship
+    :param length1, width1: size of the first ship in meters
+    :param lat2, lon2: center of the second ship
+    :param length2, width2: size of the second ship in meters
+    :return: minimal distance between the two rectangles in meters
+    """
+    # Convert size from meters to degrees (approximation)
+    lat1_offset = length1 / 111320  # 1 degree latitude is approx 111.32 km
+    lon1_offset = width1 / (111320 * cos(radians(lat1)))
+
+    lat2_offset = length2 / 111320
+    lon2_offset = width2 / (111320 * cos(radians(lat2)))
+
+    corners1 = [
+        (lat1 + lat1_offset / 2, lon1 + lon1_offset / 2),
+        (lat1 + lat1_offset / 2, lon1 - lon1_offset / 2),
+        (lat1 - lat1_offset / 2, lon1 + lon1_offset / 2),
+        (lat1 - lat1_offset / 2, lon1 - lon1_offset / 2),
+    ]
+
+    corners2 = [
+        (lat2 + lat2_offset / 2, lon2 + lon2_offset / 2),
+        (lat2 + lat2_offset / 2, lon2 - lon2_offset / 2),
+        (lat2 - lat2_offset / 2, lon2 + lon2_offset / 2),
+        (lat2 - lat2_offset / 2, lon2 - lon2_offset / 2),
+    ]
+
+    min_distance = float('inf')
+    for corner1 in corners1:
+        for corner2 in corners2:
+            distance = haversine(corner1[0], corner1[1], corner2[0], corner2[1])
+            if distance < min_distance:
+                min_distance = distance
+
+    return min_distance
+
+
+def haversine_np(lat1, lon1, lat2, lon2):
+    """Vectorized haversine over broadcastable arrays of coordinates in degrees."""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = np.sin(dlat/2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon/2)**2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1-a))
+    return EARTH_RADIUS * c
+
+
+# Corner order of rectangle_distance as (lat sign, lon sign)
+_CORNER_LAT_SIGNS = np.array([1.0, 1.0, -1.0, -1.0])
+_CORNER_LON_SIGNS = np.array([1.0, -1.0, 1.0, -1.0])
+
+
+def rectangle_corners_np(lat, lon, length, width):
+    """
+    Corners of many ship rectangles at once.
+    :return: (corner_lat, corner_lon), each of shape (n, 4)
+    """
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    lat_offset = np.asarray(length, dtype=float) / 111320
+    lon_offset = np.asarray(width, dtype=float) / (111320 * np.cos(np.radians(lat)))
+    corner_lat = lat[:, None] + _CORNER_LAT_SIGNS * (lat_offset[:, None] / 2)
+    corner_lon = lon[:, None] + _CORNER_LON_SIGNS * (lon_offset[:, None] / 2)
+    return corner_lat, corner_lon
+
+
+def rectangle_distance_np(lat1, lon1, length1, width1, lat2, lon2, length2, width2):
+    """
+    Batched rectangle_distance: computes all 4x4 corner distances of n ship pairs in one pass.
+    All arguments are arrays of shape (n,), sizes in meters.
+    :return: array of shape (n,) with the minimal corner distance of every pair in meters
+    """
+    corner_lat1, corner_lon1 = rectangle_corners_np(lat1, lon1, length1, width1)
+    corner_lat2, corner_lon2 = rectangle_corners_np(lat2, lon2, length2, width2)
+    distances = haversine_np(corner_lat1[:, :, None], corner_lon1[:, :, None],
+                             corner_lat2[:, None, :], corner_lon2[:, None, :])
+    return distances.reshape(len(distances), -1).min(axis=1)
@@ -0,0 +1,89 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import NULL_METRICS
+
+
+class RateLimiter:
+    """Spaces out requests so that each host sees at most `rate` requests per second."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.lock = threading.Lock()
+        self.next_slot = {}
+
+    def wait(self, host):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class HttpClient:
+    RETRY_STATUS = {429, 500, 502, 503, 504}
+
+    def __init__(self, headers, max_workers=8, rate_limit=5.0, timeout=10, retries=3, backoff=0.5, metrics=None):
+        """
+        Shared, pooled HTTP session used by all fetches of the analyzer.
+        :param headers: default headers sent with every request
+        :param max_workers: number of concurrent requests (and pooled connections per host)
+        :param rate_limit: maximum requests per second per host, 0 disables the limit
+        :param timeout: per-request timeout in seconds
+        :param retries: number of retries on connection errors, timeouts and 429/5xx responses
+        :param backoff: base delay in seconds, doubled after every failed attempt
+        :param metrics: Metrics that receive latency, status and size of every attempt
+        """
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.limiter = RateLimiter(rate_limit)
+        self.metrics = metrics or NULL_METRICS
+        self.session = requests.Session()
+        self.session.headers.update(headers)
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get(self, url, headers=None):
+        host = urlsplit(url).netloc
+        for attempt in range(self.retries + 1):
+            self.limiter.wait(host)
+            delay = self.backoff * 2 ** attempt
+            started = time.perf_counter()
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self.metrics.request(url, type(e).__name__, time.perf_counter() - started, 0)
+                error = e
+            else:
+                self.metrics.request(url, response.status_code, time.perf_counter() - started, len(response.content))
+                if response.status_code not in self.RETRY_STATUS:
+                    response.raise_for_status()
+                    return response
+                error = requests.HTTPError(f"{response.status_code} Error for url: {url}", response=response)
+                retry_after = response.headers.get('Retry-After', '')
+                if retry_after.isdigit():
+                    delay = max(delay, int(retry_after))
+            if attempt < self.retries:
+                time.sleep(delay)
+        raise error
+
+    def map(self, func, items):
+        """Runs `func` for every item on the worker pool and yields (item, result) as they complete."""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(func, item): item for item in items}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+    def close(self):
+        self.session.close()
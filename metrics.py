@@ -0,0 +1,241 @@
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+METRICS_FILE = 'metrics.json'
+PROMETHEUS_FILE = 'metrics.prom'
+PROMETHEUS_PREFIX = 'shiptracker_'
+
+# Upper bounds in seconds, as Prometheus histogram buckets
+LATENCY_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PARSE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+
+
+def endpoint_name(url):
+    """First path segment of url, e.g. '/vessels' for a vessel page and '/requests' for the area feed."""
+    return '/' + urlsplit(url).path.lstrip('/').split('/', 1)[0]
+
+
+def label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+class Histogram:
+    __slots__ = ('bounds', 'counts', 'count', 'sum')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        index = 0
+        while index < len(self.bounds) and value > self.bounds[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """:return: list of (upper bound, observations at or below it), ending with ('+Inf', count)"""
+        total = 0
+        buckets = []
+        for bound, count in zip((*self.bounds, '+Inf'), self.counts):
+            total += count
+            buckets.append((bound, total))
+        return buckets
+
+
+class Metrics:
+    """
+    Stage timers, counters and histograms of one run, safe to update from the fetch threads.
+    Stages are timed with `with metrics.stage('pairing'):` or the @timed decorator; HttpClient reports
+    every request attempt with its endpoint, status, latency and size.
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started = time.time()
+            self.stages = {}
+            self.counters = {}
+            self.histograms = {}
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self.lock:
+                runs, seconds, longest = self.stages.get(name, (0, 0.0, 0.0))
+                self.stages[name] = (runs + 1, seconds + elapsed, max(longest, elapsed))
+
+    def count(self, name, value=1, **labels):
+        key = (name, label_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, bounds=LATENCY_BUCKETS, **labels):
+        key = (name, label_key(labels))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(bounds)
+            histogram.observe(value)
+
+    def request(self, url, status, seconds, size):
+        """
+        Records one HTTP request attempt.
+        :param status: HTTP status code, or the exception name if no response arrived
+        :param size: bytes of the response body
+        """
+        endpoint = endpoint_name(url)
+        self.observe('http_request_seconds', seconds, endpoint=endpoint)
+        self.count('http_responses', endpoint=endpoint, status=str(status))
+        if size:
+            self.count('http_bytes', size, endpoint=endpoint)
+
+    def merge(self, data):
+        """Adds the numbers of a saved metrics.json, e.g. of earlier commands on the same run directory."""
+        with self.lock:
+            self.started = min(self.started, datetime.fromisoformat(data['started']).timestamp())
+            for name, values in data['stages'].items():
+                runs, seconds, longest = self.stages.get(name, (0, 0.0, 0.0))
+                self.stages[name] = (runs + values['runs'], seconds + values['seconds'], max(longest, values['max_seconds']))
+            for name, series in data['counters'].items():
+                for item in series:
+                    key = (name, label_key(item['labels']))
+                    self.counters[key] = self.counters.get(key, 0) + item['value']
+            for name, series in data['histograms'].items():
+                for item in series:
+                    bounds = tuple(float(bound) for bound in item['buckets'] if bound != '+Inf')
+                    key = (name, label_key(item['labels']))
+                    histogram = self.histograms.get(key)
+                    if histogram is None:
+                        histogram = self.histograms[key] = Histogram(bounds)
+                    elif histogram.bounds != bounds:
+                        continue
+                    previous = 0
+                    for index, total in enumerate(item['buckets'].values()):
+                        histogram.counts[index] += total - previous
+                        previous = total
+                    histogram.count += item['count']
+                    histogram.sum += item['sum']
+
+    def to_dict(self):
+        with self.lock:
+            counters, histograms = {}, {}
+            for (name, labels), value in sorted(self.counters.items()):
+                counters.setdefault(name, []).append({'labels': dict(labels), 'value': value})
+            for (name, labels), histogram in sorted(self.histograms.items(), key=lambda item: item[0]):
+                histograms.setdefault(name, []).append({
+                    'labels': dict(labels), 'count': histogram.count, 'sum': round(histogram.sum, 6),
+                    'buckets': {str(bound): count for bound, count in histogram.cumulative()}})
+            return {
+                'started': datetime.fromtimestamp(self.started, timezone.utc).isoformat(timespec='seconds'),
+                'stages': {name: {'runs': runs, 'seconds': round(seconds, 6), 'max_seconds': round(longest, 6)}
+                           for name, (runs, seconds, longest) in self.stages.items()},
+                'counters': counters,
+                'histograms': histograms,
+            }
+
+    def prometheus(self):
+        """:return: the metrics in the Prometheus text exposition format"""
+        data = self.to_dict()
+        lines = []
+        if data['stages']:
+            for suffix, field in (('stage_seconds_total', 'seconds'), ('stage_runs_total', 'runs')):
+                lines.append(f"# TYPE {PROMETHEUS_PREFIX}{suffix} counter")
+                lines.extend(f'{PROMETHEUS_PREFIX}{suffix}{{stage="{stage}"}} {values[field]}'
+                             for stage, values in data['stages'].items())
+        for name, series in data['counters'].items():
+            lines.append(f"# TYPE {PROMETHEUS_PREFIX}{name}_total counter")
+            lines.extend(f"{PROMETHEUS_PREFIX}{name}_total{prometheus_labels(item['labels'])} {item['value']}"
+                         for item in series)
+        for name, series in data['histograms'].items():
+            lines.append(f"# TYPE {PROMETHEUS_PREFIX}{name} histogram")
+            for item in series:
+                for bound, count in item['buckets'].items():
+                    labels = prometheus_labels({**item['labels'], 'le': bound})
+                    lines.append(f"{PROMETHEUS_PREFIX}{name}_bucket{labels} {count}")
+                lines.append(f"{PROMETHEUS_PREFIX}{name}_sum{prometheus_labels(item['labels'])} {item['sum']}")
+                lines.append(f"{PROMETHEUS_PREFIX}{name}_count{prometheus_labels(item['labels'])} {item['count']}")
+        return '\n'.join(lines) + '\n'
+
+    def save(self, directory, prometheus=False):
+        """
+        Writes metrics.json, and metrics.prom if prometheus is set, to directory. The numbers of an existing
+        metrics.json are added, so the file covers every command run on the directory.
+        :return: path of metrics.json
+        """
+        path = os.path.join(directory, METRICS_FILE)
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                self.merge(json.load(file))
+        except (OSError, ValueError, KeyError):
+            pass
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.to_dict(), file, indent=4)
+        if prometheus:
+            with open(os.path.join(directory, PROMETHEUS_FILE), 'w', encoding='utf-8') as file:
+                file.write(self.prometheus())
+        return path
+
+
+class NullMetrics:
+    """Stand-in while metrics are disabled: every call returns at once and nothing is recorded or written."""
+
+    enabled = False
+    _stage = nullcontext()
+
+    def reset(self):
+        pass
+
+    def stage(self, name):
+        return self._stage
+
+    def count(self, name, value=1, **labels):
+        pass
+
+    def observe(self, name, value, bounds=LATENCY_BUCKETS, **labels):
+        pass
+
+    def request(self, url, status, seconds, size):
+        pass
+
+    def save(self, directory, prometheus=False):
+        return None
+
+
+NULL_METRICS = NullMetrics()
+
+
+def prometheus_labels(labels):
+    if not labels:
+        return ''
+    values = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in labels.values())
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(labels, values)) + '}'
+
+
+def timed(stage):
+    """Times every call of a method as stage in self.metrics."""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.metrics.stage(stage):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
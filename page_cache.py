@@ -0,0 +1,134 @@
+import gzip
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+CACHE_DIRECTORY = os.path.join(os.path.expanduser('~'), '.cache', 'sts-tracking')
+
+
+class PageCache:
+    """
+    On-disk cache for vessel pages shared by all runs, keyed by URL and tagged with the MMSI.
+
+    Entries younger than `ttl` seconds are served without a request. Older entries are revalidated
+    with If-None-Match/If-Modified-Since and reused on 304 Not Modified. When the stored bodies grow
+    beyond `max_bytes`, the least recently used entries are evicted.
+    """
+
+    def __init__(self, directory=CACHE_DIRECTORY, ttl=900, max_bytes=512 * 1024 * 1024):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.stats = Counter()
+        self.lock = threading.Lock()
+        os.makedirs(os.path.join(directory, 'pages'), exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(directory, 'index.sqlite'), check_same_thread=False)
+        self.db.execute("""CREATE TABLE IF NOT EXISTS pages (
+            key TEXT PRIMARY KEY, url TEXT, mmsi TEXT, etag TEXT, last_modified TEXT,
+            fetched_at REAL, accessed_at REAL, size INTEGER)""")
+        self.db.execute("CREATE INDEX IF NOT EXISTS pages_accessed_at ON pages (accessed_at)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS pages_mmsi ON pages (mmsi)")
+        self.db.commit()
+        self.total_bytes = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        self.evict()
+        self.db.commit()
+
+    def fetch(self, client, url, mmsi=None, revalidate=False):
+        """
+        Returns the body of url, from the cache if possible.
+        :param client: HttpClient used for misses and revalidation
+        :param revalidate: ask the server even if the cached page is still fresh, e.g. for a vessel known to have moved
+        """
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        with self.lock:
+            entry = self.db.execute("SELECT etag, last_modified, fetched_at FROM pages WHERE key = ?", (key,)).fetchone()
+        body = self.read_body(key) if entry else None
+        now = time.time()
+
+        if body is not None and not revalidate and now - entry[2] < self.ttl:
+            self.touch(key, now)
+            self.count('hits')
+            return body
+
+        headers = {}
+        if body is not None:
+            if entry[0]:
+                headers['If-None-Match'] = entry[0]
+            if entry[1]:
+                headers['If-Modified-Since'] = entry[1]
+        response = client.get(url, headers=headers or None)
+
+        if response.status_code == 304 and body is not None:
+            self.touch(key, now, fetched_at=now)
+            self.count('revalidated')
+            return body
+
+        self.count('misses')
+        self.store(key, url, mmsi, response, now)
+        return response.text
+
+    def count(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+    def body_path(self, key):
+        return os.path.join(self.directory, 'pages', key[:2], key + '.html.gz')
+
+    def read_body(self, key):
+        try:
+            with gzip.open(self.body_path(key), 'rt', encoding='utf-8') as file:
+                return file.read()
+        except (OSError, EOFError):
+            return None
+
+    def touch(self, key, now, fetched_at=None):
+        with self.lock:
+            if fetched_at is None:
+                self.db.execute("UPDATE pages SET accessed_at = ? WHERE key = ?", (now, key))
+            else:
+                self.db.execute("UPDATE pages SET accessed_at = ?, fetched_at = ? WHERE key = ?", (now, fetched_at, key))
+            self.db.commit()
+
+    def store(self, key, url, mmsi, response, now):
+        path = self.body_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with gzip.open(temp_path, 'wt', encoding='utf-8') as file:
+            file.write(response.text)
+        os.replace(temp_path, path)
+        size = os.path.getsize(path)
+        with self.lock:
+            previous = self.db.execute("SELECT size FROM pages WHERE key = ?", (key,)).fetchone()
+            self.db.execute("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                            (key, url, mmsi, response.headers.get('ETag'), response.headers.get('Last-Modified'), now, now, size))
+            self.total_bytes += size - (previous[0] if previous else 0)
+            self.evict()
+            self.db.commit()
+
+    def evict(self):
+        """Drops least recently used entries until the cache fits max_bytes. Caller holds the lock."""
+        while self.total_bytes > self.max_bytes:
+            oldest = self.db.execute("SELECT key, size FROM pages ORDER BY accessed_at LIMIT 64").fetchall()
+            if not oldest:
+                break
+            for key, size in oldest:
+                if self.total_bytes <= self.max_bytes:
+                    break
+                self.db.execute("DELETE FROM pages WHERE key = ?", (key,))
+                try:
+                    os.remove(self.body_path(key))
+                except OSError:
+                    pass
+                self.total_bytes -= size
+                self.stats['evicted'] += 1
+
+    def summary(self):
+        return (f"Cache: {self.stats['hits']} Treffer, {self.stats['revalidated']} revalidiert, "
+                f"{self.stats['misses']} Fehlschläge, {self.stats['evicted']} verdrängt "
+                f"({self.total_bytes / 1024 / 1024:.1f} MB belegt)")
+
+    def close(self):
+        self.db.close()
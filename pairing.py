@@ -0,0 +1,121 @@
+from collections import defaultdict
+from math import cos, radians, floor
+
+import numpy as np
+
+from geo import METERS_PER_DEGREE, rectangle_distance_np
+from vessel import VesselTable
+
+# Candidate pairs evaluated per vectorized pass, bounds the (n, 4, 4) corner distance arrays
+PAIR_BATCH_SIZE = 65536
+
+# Largest half diagonal of a ship rectangle expected by incrementally updated indexes (458 x 69 m)
+MAX_HALF_DIAGONAL = 240
+
+
+class GridIndex:
+    """
+    Uniform lat/lon grid with cells at least `reach` meters wide, so any two points
+    within `reach` of each other lie in the same or in neighbouring cells.
+    Longitude cells wrap around the antimeridian. Points can be added and removed later on,
+    as long as they stay within max_lat degrees of the equator.
+    """
+
+    def __init__(self, lat, lon, reach, max_lat=None):
+        self.lat_step = max(reach, 1.0) / METERS_PER_DEGREE
+        if max_lat is None:
+            max_lat = max((abs(value) for value in lat), default=0.0)
+        cos_lat = cos(radians(min(max_lat + self.lat_step, 90.0)))
+        # 10% slack covers sin(x) < x for longitude differences of up to ~80 degrees
+        lon_step = 1.1 * self.lat_step / cos_lat if cos_lat > 1e-9 else 360.0
+        self.lon_cells = max(1, int(360.0 // min(lon_step, 360.0)))
+        self.lon_step = 360.0 / self.lon_cells
+        self.cells = defaultdict(list)
+        for i, (cell_lat, cell_lon) in enumerate(zip(lat, lon)):
+            self.add(i, cell_lat, cell_lon)
+
+    def add(self, key, lat, lon):
+        self.cells[self.cell(lat, lon)].append(key)
+
+    def remove(self, key, lat, lon):
+        cell = self.cell(lat, lon)
+        self.cells[cell].remove(key)
+        if not self.cells[cell]:
+            del self.cells[cell]
+
+    def cell(self, lat, lon):
+        return floor(lat / self.lat_step), int(((lon + 180.0) % 360.0) // self.lon_step) % self.lon_cells
+
+    def neighbours(self, row, col):
+        cols = {(col + offset) % self.lon_cells for offset in (-1, 0, 1)}
+        return [(r, c) for r in (row - 1, row, row + 1) for c in cols]
+
+    def query(self, lat, lon):
+        """Yields the indices of all points in the cell of (lat, lon) and its neighbours."""
+        for key in self.neighbours(*self.cell(lat, lon)):
+            yield from self.cells.get(key, ())
+
+    def candidate_pairs(self):
+        """
+        All index pairs (i, j) with i < j that share a cell or lie in neighbouring cells.
+        :return: two intp arrays
+        """
+        cells = {key: np.array(members, dtype=np.intp) for key, members in self.cells.items()}
+        firsts, seconds = [], []
+        for key, members in cells.items():
+            for neighbour in self.neighbours(*key):
+                others = cells.get(neighbour)
+                if others is None:
+                    continue
+                first = np.repeat(members, len(others))
+                second = np.tile(others, len(members))
+                keep = first < second
+                firsts.append(first[keep])
+                seconds.append(second[keep])
+        if not firsts:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+        return np.concatenate(firsts), np.concatenate(seconds)
+
+
+class PairingEngine:
+    def __init__(self, analyzer):
+        self.analyzer = analyzer
+
+    def find_pairs(self, data, distance_threshold, speed_threshold=None):
+        """
+        Finds all pairs of valid ships with a position whose rectangles are within distance_threshold meters.
+        Candidates are pruned with a grid index and only survivors get the exact rectangle distance,
+        evaluated in vectorized batches.
+        :param data: vessels dict as stored in vessels.json, or a VesselTable parsed from it
+        :param speed_threshold: if set, ships faster than this (or without a speed) are left out
+        :return: list of (ship_id1, ship_id2, distance), in the same order as the pairwise loop over data
+        """
+        vessels = data if isinstance(data, VesselTable) else VesselTable.from_vessels(data)
+        mask = vessels.valid()
+        if speed_threshold:
+            mask &= vessels.column('speed') <= speed_threshold
+        selected = np.flatnonzero(mask)
+        lat, lon = vessels.column('lat')[selected], vessels.column('lon')[selected]
+        length = np.nan_to_num(vessels.column('length')[selected])
+        width = np.nan_to_num(vessels.column('width')[selected])
+        # Every corner lies within half a diagonal of its center, so centers of a pair are at most this far apart
+        reach = (distance_threshold + 2 * vessels.max_half_diagonal(mask)) * 1.01 + 1.0
+        index = GridIndex(lat.tolist(), lon.tolist(), reach)
+
+        first, second = index.candidate_pairs()
+        self.analyzer.metrics.count('pair_candidates', len(first))
+        distances = np.empty(len(first))
+        for start in range(0, len(first), PAIR_BATCH_SIZE):
+            i = first[start:start + PAIR_BATCH_SIZE]
+            j = second[start:start + PAIR_BATCH_SIZE]
+            distances[start:start + PAIR_BATCH_SIZE] = rectangle_distance_np(
+                lat[i], lon[i], length[i], width[i], lat[j], lon[j], length[j], width[j])
+
+        keep = distances <= distance_threshold
+        first, second, distances = first[keep], second[keep], distances[keep]
+        self.analyzer.metrics.count('pairs', len(first))
+        order = np.lexsort((second, first))
+        ids = vessels.ids
+        selected = selected.tolist()
+        return [(ids[selected[i]], ids[selected[j]], distance)
+                for i, j, distance in zip(first[order].tolist(), second[order].tolist(), distances[order].tolist())]
@@ -1,34 +1,78 @@
 import json
-import folium
 import os
-import requests
-from bs4 import BeautifulSoup
-from datetime import datetime
+import threading
 import time
-import pandas as pd
-from math import radians, cos, sin, sqrt, atan2
+from datetime import datetime
+from functools import cached_property
+from math import ceil, cos, radians
 import webbrowser
-import geopandas as gpd
-from shapely.geometry import Point
 import colorama
 from colorama import Fore, Style
-from shapely.geometry import Polygon, Point, box
-from folium import plugins
+# requests, numpy, shapely, folium and geopandas take most of the startup time. They and the modules built
+# on them (HTTP client, geo, pairing, rendezvous, analytics, selection server) are imported by the methods that use them, so
+# commands working on saved runs such as clean and export start without them.
+from page_cache import CACHE_DIRECTORY, PageCache
+from extractor import COORDINATE_FIELDS, EXTRACTOR_VERSION, extract_ship_data, clean_field_value
+from export import VESSEL_COLUMNS, pair_columns, pair_rows, select_columns, vessel_rows, write_rows
+from store import STORE_FILE, SnapshotStore
+from archive import PACK_FILE, PAGE_FILE, PageArchive, migrate_directory, parse_archived_page
+from metrics import NULL_METRICS, PARSE_BUCKETS, Metrics, timed
 
 colorama.init()
 
-DOWNLOAD_FOLDER = os.path.join(os.path.expanduser('~'), 'Downloads')
+PAGE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'index.html')
+BASE_URL = 'https://www.myshiptracking.com'
+MANIFEST_FILE = '.vessels_manifest.json'
 
 class ShipDataAnalyzer:
-    def __init__(self):
+    def __init__(self, max_workers=8, rate_limit=5.0, timeout=10, base_url=BASE_URL,
+                 cache_directory=CACHE_DIRECTORY, cache_ttl=900, cache_size=512 * 1024 * 1024, store_path=STORE_FILE,
+                 metrics=False):
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.36'
         }
+        self.base_url = base_url
+        # Stage timers and HTTP histograms, saved per run by save_metrics; a no-op unless enabled
+        self.metrics = Metrics() if metrics else NULL_METRICS
+        self.client_options = {'max_workers': max_workers, 'rate_limit': rate_limit, 'timeout': timeout}
+        # Shared across runs; cache_directory=None always downloads
+        self.page_cache = PageCache(cache_directory, cache_ttl, cache_size) if cache_directory else None
+        # Snapshots of all runs; store_path=None keeps them in vessels.json only
+        self.store = SnapshotStore(store_path) if store_path else None
+        self.selection_server = None
+        # Directory of the last run set up by setup_directory
+        self.run_directory = None
+        # Area tiles that could not be fetched by the last get_ships_in_area call; its result is incomplete if > 0
+        self.failed_tiles = 0
+        # Open page archives by run directory, shared by the fetch threads. Archives opened for
+        # reprocessing, migration or cleaning are closed again once that directory is done.
+        self.archives = {}
+        self.archives_lock = threading.Lock()
+
+    @cached_property
+    def client(self):
+        """Pooled HttpClient shared by all fetches, created on the first request."""
+        from http_client import HttpClient
+
+        return HttpClient(self.headers, metrics=self.metrics, **self.client_options)
+
+    @cached_property
+    def analytics(self):
+        """Port-call and trip aggregates over all stored runs, brought up to date as runs are saved; None without a store."""
+        if not self.store:
+            return None
+        from analytics import PortAnalytics
+
+        return PortAnalytics(self.store)
 
     def setup_directory(self, selected_area=None):
         current_time = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
         directory_name = f"data_{current_time}"
         os.makedirs(directory_name, exist_ok=True)
+        # Only the archive of the current fetch run stays open
+        if self.run_directory is not None:
+            self.close_archive(self.run_directory)
+        self.run_directory = directory_name
         
         if selected_area:
             self.create_map_html(directory_name, selected_area)
@@ -36,15 +80,38 @@ class ShipDataAnalyzer:
         
         return directory_name
 
-    def load_data(self):
-        json_path = os.path.join(DOWNLOAD_FOLDER, 'selected_area.geojson')
-        while not os.path.exists(json_path):
-            time.sleep(1)
-        with open(json_path, 'r') as f:
-            data = json.load(f)
-        #print("Empfangene GeoJSON-Daten:", json.dumps(data, indent=2))
-        os.remove(json_path)
-        
+    def load_data(self, timeout=None):
+        """Waits until the area is confirmed on the page opened by open_html_page, None on timeout."""
+        if self.selection_server is None:
+            self.open_html_page()
+        try:
+            data = self.selection_server.wait(timeout)
+        finally:
+            self.selection_server.close()
+            self.selection_server = None
+        if data is None:
+            print("Kein Bereich ausgewählt.")
+            return None
+        return self.parse_geojson_area(data)
+
+    def area_from_file(self, path):
+        """Selected area from a GeoJSON file as written by index.html or save_geojson."""
+        with open(path, 'r') as f:
+            return self.parse_geojson_area(json.load(f))
+
+    def area_from_bbox(self, minlon, minlat, maxlon, maxlat):
+        coordinates = [[minlon, minlat], [maxlon, minlat], [maxlon, maxlat], [minlon, maxlat], [minlon, minlat]]
+        return self.parse_geojson_area({'type': 'FeatureCollection', 'features': [
+            {'type': 'Feature', 'geometry': {'type': 'Polygon', 'coordinates': [coordinates]}, 'properties': {}}]})
+
+    def area_from_circle(self, lon, lat, radius_km):
+        return self.parse_geojson_area({'type': 'FeatureCollection', 'features': [
+            {'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': [lon, lat]}, 'properties': {'radius': radius_km}}]})
+
+    def parse_geojson_area(self, data):
+        """Turns the GeoJSON written by index.html (first feature: polygon, or point with a radius property in km) into a selected area."""
+        from shapely.geometry import Point, Polygon
+
         if data['type'] == 'FeatureCollection' and len(data['features']) > 0:
             feature = data['features'][0]
             geometry = feature['geometry']
@@ -58,7 +125,7 @@ class ShipDataAnalyzer:
                     radius_km = 0
                 
                 if radius_km > 0:
-                    shape = Point(center).buffer(radius_km / 111.32)
+                    shape = self.circle_shape(center[0], center[1], radius_km)
                     minlon, minlat, maxlon, maxlat = shape.bounds
                 else:
                     print("Radius ist 0 oder negativ. Verwende einen Punkt statt eines Kreises.")
@@ -74,21 +141,44 @@ class ShipDataAnalyzer:
                 print(f"Unbekannter Geometrietyp: {geometry['type']}")
                 return None
 
-            return {
+            selected_area = {
                 'minlon': minlon, 'minlat': minlat, 'maxlon': maxlon, 'maxlat': maxlat,
                 'shape': shape
             }
+            if geometry['type'] == 'Point':
+                # Circles are filtered by exact distance, the shape only drives tiling and the map
+                selected_area['center'] = (center[0], center[1])
+                selected_area['radius_km'] = max(radius_km, 0)
+            return selected_area
         else:
             print("Ungültiges GeoJSON-Format oder leere FeatureCollection.")
             return None
 
+    def circle_shape(self, lon, lat, radius_km):
+        """Polygon approximating a circle of radius_km around (lon, lat), widened in longitude for its latitude."""
+        from shapely.affinity import scale
+        from shapely.geometry import Point
+        from geo import METERS_PER_DEGREE
+
+        lat_radius = radius_km * 1000 / METERS_PER_DEGREE
+        lon_radius = lat_radius / max(cos(radians(lat)), 1e-6)
+        return scale(Point(lon, lat).buffer(1, quad_segs=32), xfact=lon_radius, yfact=lat_radius)
+
     def create_circle(self, lat, lon, radius_km):
+        import geopandas as gpd
+        from shapely.geometry import Point
+
         point = Point(lon, lat)
         circle = point.buffer(radius_km / 111.32)
         return gpd.GeoDataFrame(geometry=[circle], crs="EPSG:4326")
 
     def open_html_page(self):
-        webbrowser.open('file://' + os.path.realpath('index.html'))
+        """Opens the area selection page, served locally so that it can post the confirmed area back."""
+        from selection import AreaSelectionServer
+
+        if self.selection_server is None:
+            self.selection_server = AreaSelectionServer(PAGE_PATH)
+        webbrowser.open(self.selection_server.url)
 
     def convert_coordinates(self, coord_str):
         coord_str = coord_str.replace('°', '').replace('N', '').replace('S', '-').replace('E', '').replace('W', '')
@@ -98,142 +188,448 @@ class ShipDataAnalyzer:
             print(f"Conversion error with string: {coord_str}")
             return 0.0
 
-    def get_ships_in_area(self, selected_area):
+    @timed('area_fetch')
+    def get_ships_in_area(self, selected_area, tile_size=1.0, max_tile_ships=500, max_depth=8):
+        """
+        Fetches all ships inside the selected area. The bounding box is split into tiles of tile_size degrees
+        that are fetched concurrently; tiles returning max_tile_ships or more lines are likely truncated
+        by the service and are split into quarters again, up to max_depth times.
+        The number of tiles that could not be fetched is left in self.failed_tiles.
+        :return: dict of MMSI -> position, name and type, in tile order
+        """
+        import numpy as np
+        from shapely.geometry import box
+
         if not selected_area or not isinstance(selected_area, dict):
             print("Kein gültiger Bereich ausgewählt.")
             return {}
 
-        minlon, minlat, maxlon, maxlat = selected_area['minlon'], selected_area['minlat'], selected_area['maxlon'], selected_area['maxlat']
+        self.failed_tiles = 0
         shape = selected_area['shape']
+        pending = [(key, tile, 0) for key, tile in self.split_into_tiles(selected_area, tile_size, shape)]
+        tile_lines = []
+        failed = 0
+        while pending:
+            subdivided = []
+            for (key, tile, depth), lines in self.client.map(self.fetch_area_tile, pending):
+                if lines is None:
+                    failed += 1
+                    continue
+                tile_lines.append((key, lines))
+                if len(lines) >= max_tile_ships and depth < max_depth:
+                    subdivided.extend((key + (index,), quarter, depth + 1)
+                                      for index, quarter in enumerate(self.quarter_tile(tile))
+                                      if shape.intersects(box(*quarter)))
+            pending = subdivided
+
+        self.failed_tiles = failed
+        if failed and not tile_lines:
+            return {}
+        if failed:
+            print(f"{failed} Kacheln konnten nicht abgerufen werden, das Ergebnis ist unvollständig.")
 
-        url = f'https://www.myshiptracking.com/requests/vesselsonmaptempTTT.php?type=json&minlat={minlat}&maxlat={maxlat}&minlon={minlon}&maxlon={maxlon}&zoom=11&selid=-1&seltype=0&timecode=-1'
-        
+        lines = [line for key, lines in sorted(tile_lines, key=lambda item: item[0]) for line in lines]
+        feed = self.parse_area_feed(lines)
+        inside = self.area_mask(selected_area, feed['lat'], feed['lon'])
+        vessels = {}
+        for index in np.flatnonzero(inside).tolist():
+            vessels.setdefault(feed['mmsi'][index], {
+                'latitude': float(feed['lat'][index]),
+                'longitude': float(feed['lon'][index]),
+                'name': feed['name'][index],
+                'type': feed['type'][index]
+            })
+        return vessels
+
+    def split_into_tiles(self, selected_area, tile_size, shape):
+        """Yields (key, (minlon, minlat, maxlon, maxlat)) for every tile of the bounding box that touches shape."""
+        from shapely.geometry import box
+
+        minlon, minlat, maxlon, maxlat = selected_area['minlon'], selected_area['minlat'], selected_area['maxlon'], selected_area['maxlat']
+        rows = max(1, ceil((maxlat - minlat) / tile_size))
+        cols = max(1, ceil((maxlon - minlon) / tile_size))
+        lat_step = (maxlat - minlat) / rows
+        lon_step = (maxlon - minlon) / cols
+        for row in range(rows):
+            for col in range(cols):
+                tile = (minlon + col * lon_step, minlat + row * lat_step,
+                        maxlon if col == cols - 1 else minlon + (col + 1) * lon_step,
+                        maxlat if row == rows - 1 else minlat + (row + 1) * lat_step)
+                if rows * cols == 1 or shape.intersects(box(*tile)):
+                    yield (row, col), tile
+
+    def quarter_tile(self, tile):
+        minlon, minlat, maxlon, maxlat = tile
+        midlon, midlat = (minlon + maxlon) / 2, (minlat + maxlat) / 2
+        return [(minlon, minlat, midlon, midlat), (midlon, minlat, maxlon, midlat),
+                (minlon, midlat, midlon, maxlat), (midlon, midlat, maxlon, maxlat)]
+
+    def fetch_area_tile(self, pending_tile):
+        """:return: the non-empty lines of the vessel feed for one tile, None if the request failed"""
+        import requests
+
+        key, (minlon, minlat, maxlon, maxlat), depth = pending_tile
+        url = f'{self.base_url}/requests/vesselsonmaptempTTT.php?type=json&minlat={minlat}&maxlat={maxlat}&minlon={minlon}&maxlon={maxlon}&zoom=11&selid=-1&seltype=0&timecode=-1'
         try:
-            response = requests.get(url, headers=self.headers, timeout=10)
-            response.raise_for_status()
+            response = self.client.get(url)
         except requests.RequestException as e:
             print(f"Fehler beim Abrufen der Daten: {e}")
-            return {}
+            self.metrics.count('failures', stage='area_fetch', error=type(e).__name__)
+            return None
+        return [line for line in response.text.split('\n') if line.strip()]
 
-        vessels = {}
-        content = response.text
-        lines = content.split('\n')
+    def parse_area_feed(self, lines):
+        """
+        Parses vessel feed lines into columns.
+        :return: dict with 'name', 'type' and 'mmsi' lists and 'lat'/'lon' float arrays
+        """
+        import numpy as np
 
+        names, types, mmsis, lats, lons = [], [], [], [], []
         for line in lines:
-            if not line.strip():
-                continue
-            try:
-                data_list = line.split("\t")
-                if len(data_list) >= 6:
-                    mmsi = data_list[2]
-                    lat = self.convert_coordinates(data_list[4])
-                    lon = self.convert_coordinates(data_list[5])
-                    point = Point(lon, lat)
-                    
-                    if shape.contains(point):
-                        vessels[mmsi] = {
-                            'latitude': lat,
-                            'longitude': lon,
-                            'name': data_list[0],
-                            'type': data_list[1]
-                        }
-            except Exception as e:
-                print(f"Fehler beim Verarbeiten einer Zeile: {e}")
+            data_list = line.split("\t")
+            if len(data_list) < 6:
                 continue
+            names.append(data_list[0])
+            types.append(data_list[1])
+            mmsis.append(data_list[2])
+            lats.append(self.parse_feed_coordinate(data_list[4]))
+            lons.append(self.parse_feed_coordinate(data_list[5]))
+        return {'name': names, 'type': types, 'mmsi': mmsis,
+                'lat': np.array(lats, dtype=float), 'lon': np.array(lons, dtype=float)}
+
+    def parse_feed_coordinate(self, value):
+        try:
+            return float(value)
+        except ValueError:
+            return self.convert_coordinates(value)
 
-        return vessels
+    def area_mask(self, selected_area, lat, lon):
+        """Boolean array telling which of the positions lie inside the selected area."""
+        import shapely
+        from geo import haversine_np
 
-    def get_ship_data(self, ship_id, directory):
-        url = f"https://www.myshiptracking.com/vessels/{ship_id}-mmsi-{ship_id}-imo-"
-        response = requests.get(url, headers=self.headers)
-        html_content = response.text
-        file_path = os.path.join(directory, f"{ship_id}.html")
-        with open(file_path, 'w', encoding='utf-8') as file:
-            file.write(html_content)
-        soup = BeautifulSoup(html_content, 'html.parser')
-        imo = self.get_ship_data_field(soup, "IMO")
-        if not imo.replace("'","").isdigit():
-            os.remove(file_path)
-            return None
+        if 'radius_km' in selected_area:
+            center_lon, center_lat = selected_area['center']
+            return haversine_np(center_lat, center_lon, lat, lon) <= selected_area['radius_km'] * 1000
+        shape = selected_area['shape']
+        shapely.prepare(shape)
+        return shapely.contains_xy(shape, lon, lat)
 
-        fields = ["Type", "IMO", "MMSI", "Flag", "Call Sign", "Size", "GT", "DWT", "Build", "Longitude", "Latitude", "Status", "Speed", "Course", "Area", "Station", "Position Received", "Trip Time", "Trip Distance", "Average Speed", "Maximum Speed", "Draught"]
-        ship_data = {field: self.get_ship_data_field(soup, field) for field in fields}
+    def get_ship_data(self, ship_id, directory, revalidate=False):
+        import requests
 
-        ship_data['Most Visited Ports'] = self.extract_most_visited_ports(soup)
-        ship_data['Last Trips'] = self.extract_last_trips(soup)
-        ship_data['Port Calls'] = self.extract_port_calls(soup)
+        url = f"{self.base_url}/vessels/{ship_id}-mmsi-{ship_id}-imo-"
+        try:
+            if self.page_cache:
+                html_content = self.page_cache.fetch(self.client, url, ship_id, revalidate)
+            else:
+                html_content = self.client.get(url).text
+        except requests.RequestException as e:
+            print(f"Fehler beim Abrufen von Schiff {ship_id}: {e}")
+            self.metrics.count('failures', stage='detail_fetch', error=type(e).__name__)
+            return None
+        started = time.perf_counter()
+        ship_data = self.parse_ship_html(html_content)
+        self.metrics.observe('page_parse_seconds', time.perf_counter() - started, PARSE_BUCKETS)
+        if ship_data is None:
+            self.metrics.count('invalid_pages')
+        else:
+            self.page_archive(directory).append(ship_id, html_content)
+        return ship_data
 
+    def page_archive(self, directory):
+        """The PageArchive holding the raw vessel pages of a run directory, opened once per directory."""
+        key = os.path.abspath(directory)
+        with self.archives_lock:
+            if key not in self.archives:
+                self.archives[key] = PageArchive(directory)
+            return self.archives[key]
+
+    def close_archive(self, directory):
+        """Closes the PageArchive of a run directory if it is open; the next page_archive call reopens it."""
+        with self.archives_lock:
+            archive = self.archives.pop(os.path.abspath(directory), None)
+        if archive is not None:
+            archive.close()
+
+    def parse_ship_html(self, html_content):
+        """
+        Extracts fields and port/trip tables of a vessel page in a single pass.
+        :return: ship data dict, or None if the page has no valid IMO
+        """
+        ship_data = extract_ship_data(html_content)
+        if not self.is_valid_ship(ship_data):
+            return None
         return ship_data
 
+    @timed('detail_fetch')
+    def fetch_all_ship_data(self, ship_ids, directory, revalidate=False):
+        """
+        Fetches the detail pages of all ships concurrently on the shared connection pool.
+        :param ship_ids: MMSIs to fetch, e.g. the result of get_ships_in_area
+        :param directory: run directory whose page archive receives the raw pages
+        :param revalidate: skip fresh page cache entries, for ships whose cached page is known to be outdated
+        :return: dict of MMSI -> ship data in the order of ship_ids, ships without valid data are left out
+        """
+        ship_ids = list(ship_ids)
+        results = {}
+        for ship_id, ship_data in self.client.map(lambda ship_id: self.get_ship_data(ship_id, directory, revalidate), ship_ids):
+            results[ship_id] = ship_data
+            print(f"\rSchiffsdaten abgerufen: {len(results)}/{len(ship_ids)}", end='', flush=True)
+        if ship_ids:
+            print()
+        if self.page_cache:
+            print(self.page_cache.summary())
+        return {ship_id: results[ship_id] for ship_id in ship_ids if results[ship_id]}
+
     def get_ship_data_field(self, soup, field_name):
         result = soup.find(string=field_name)
         if result:
             next_td = result.find_next('td')
             if next_td:
-                value = next_td.text.strip().replace('\u00b0', '').replace('N', '').replace('S', '-').replace('E', '').replace('W', '-')
-                value = ''.join(c for c in value if c.isprintable())
-                return value if value else "Nicht verfügbar"
+                return clean_field_value(next_td.text, field_name in COORDINATE_FIELDS)
         return "Nicht verfügbar"
 
-    def process_html_files_in_directory(self, directory):
-        vessels = {}
-        for filename in os.listdir(directory):
-            if filename.endswith(".html"):
-                file_path = os.path.join(directory, filename)
-                with open(file_path, 'r', encoding='utf-8') as file:
-                    html_content = file.read()
-                ship_id = filename.split('.')[0]
-                soup = BeautifulSoup(html_content, 'html.parser')
-                fields = ["Type", "IMO", "MMSI", "Flag", "Call Sign", "Size", "GT", "DWT", "Build", "Longitude", "Latitude", "Status", "Speed", "Course", "Area", "Station", "Position Received", "Trip Time", "Trip Distance", "Average Speed", "Maximum Speed", "Draught"]
-                ship_data = {field: self.get_ship_data_field(soup, field) for field in fields}
-
-                if ship_data['IMO'].replace("'","").isdigit():
-                    ship_data['Most Visited Ports'] = self.extract_most_visited_ports(soup)
-                    ship_data['Last Trips'] = self.extract_last_trips(soup)
-                    ship_data['Port Calls'] = self.extract_port_calls(soup)
-                    vessels[ship_id] = ship_data
-                else:
-                    os.remove(file_path)
+    @timed('reprocess')
+    def process_html_files_in_directory(self, directory, workers=None, incremental=True):
+        """
+        Parses the saved vessel pages of a run directory, or of every run directory below it,
+        on a process pool and writes one vessels.json per directory.
+        :param directory: a data_<timestamp> directory or a directory containing several of them
+        :param workers: number of worker processes, defaults to the number of CPUs; 1 parses in-process
+        :param incremental: only parse pages that are new or changed since the last run
+        """
+        run_directories = self.find_page_directories(directory)
+        if not run_directories:
+            print(f"Keine Schiffsseiten in '{directory}' gefunden.")
+            return
+        from concurrent.futures import ProcessPoolExecutor
 
-        json_file_path = os.path.join(directory, "vessels.json")
-        with open(json_file_path, 'w', encoding='utf-8') as file:
-            json.dump(vessels, file, indent=4)
-        print(f"Processed HTML files and saved data in {json_file_path}")
+        workers = workers or os.cpu_count() or 1
+        executor = None
 
-    def pair_nearby_ships(self, directory, distance_threshold=75, speed_threshold=None):
-        json_file_name = os.path.join(directory, "vessels.json")
-        with open(json_file_name, 'r') as file:
-            data = json.load(file)
+        def mapper(func, paths):
+            nonlocal executor
+            if workers == 1 or len(paths) < 2:
+                return map(func, paths)
+            if executor is None:
+                executor = ProcessPoolExecutor(max_workers=workers)
+            return executor.map(func, paths, chunksize=max(1, min(64, len(paths) // (workers * 4))))
+
+        try:
+            for run_directory in run_directories:
+                self.reprocess_directory(run_directory, mapper, incremental)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+    def find_page_directories(self, root):
+        """Returns root and all directories below it that contain a page archive or loose vessel pages."""
+        directories = []
+        for current, subdirectories, filenames in os.walk(root):
+            subdirectories.sort()
+            if PACK_FILE in filenames or any(PAGE_FILE.match(filename) for filename in filenames):
+                directories.append(current)
+        return directories
+
+    def reprocess_directory(self, directory, mapper, incremental=True):
+        """
+        Re-parses the latest archived page of every vessel of one run directory into its vessels.json.
+        Loose {mmsi}.html pages of older runs are moved into the archive first.
+        In incremental mode the manifest next to vessels.json maps every vessel's page hash to its
+        parsed record, and only new or changed pages are parsed again.
+        :param mapper: map-like callable used to run parse_archived_page over page locations, results in input order
+        """
+        archive = self.page_archive(directory)
+        try:
+            migrated = migrate_directory(directory, archive)
+            if migrated:
+                print(f"{migrated} HTML-Dateien in {PACK_FILE} übernommen.")
+            manifest_path = os.path.join(directory, MANIFEST_FILE)
+            manifest = self.load_manifest(manifest_path) if incremental else {}
+            latest = archive.latest_entries()
+            entries = {}
+            to_parse = []
+            for page in latest:
+                entry = manifest.get(page.mmsi)
+                if not (entry and 'ship' in entry and entry.get('sha1') == page.sha1.hex()):
+                    entry = {'sha1': page.sha1.hex()}
+                    to_parse.append((archive.pack_path, page.offset, page.size))
+                entries[page.mmsi] = entry
+            parsed = mapper(parse_archived_page, to_parse)
+
+            def valid_ships():
+                for done, page in enumerate(latest, 1):
+                    entry = entries[page.mmsi]
+                    if 'ship' not in entry:
+                        entry['ship'], seconds = next(parsed)
+                        self.metrics.observe('page_parse_seconds', seconds, PARSE_BUCKETS)
+                    print(f"\r{directory}: {done}/{len(latest)} Seiten verarbeitet", end='', flush=True)
+                    if self.is_valid_ship(entry['ship']):
+                        yield page.mmsi, entry['ship']
+                print()
+
+            json_file_path = self.save_vessels(directory, valid_ships())
+            self.save_manifest(manifest_path, entries)
+            print(f"Processed vessel pages and saved data in {json_file_path} ({len(to_parse)} von {len(latest)} Seiten neu eingelesen)")
+        finally:
+            self.close_archive(directory)
+
+    def migrate_pages(self, root):
+        """Moves the loose {mmsi}.html pages of root and all run directories below it into page archives."""
+        total = 0
+        for directory in self.find_page_directories(root):
+            try:
+                migrated = migrate_directory(directory, self.page_archive(directory))
+            finally:
+                self.close_archive(directory)
+            if migrated:
+                print(f"{directory}: {migrated} HTML-Dateien in {PACK_FILE} übernommen.")
+            total += migrated
+        print(f"{total} HTML-Dateien archiviert.")
+        return total
+
+    def load_manifest(self, manifest_path):
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as file:
+                manifest = json.load(file)
+        except (OSError, ValueError):
+            return {}
+        if manifest.get('version') != EXTRACTOR_VERSION:
+            return {}
+        return manifest.get('files', {})
 
-        ships = list(data.keys())
-        paired_ships = []
+    def save_manifest(self, manifest_path, entries):
+        temp_path = manifest_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump({'version': EXTRACTOR_VERSION, 'files': entries}, file)
+        os.replace(temp_path, manifest_path)
 
-        for i in range(len(ships)):
-            for j in range(i + 1, len(ships)):
-                ship1 = data[ships[i]]
-                ship2 = data[ships[j]]
+    @timed('save')
+    def save_vessels(self, directory, ships):
+        """
+        Writes the vessels of a run to its vessels.json and records them in the snapshot store.
+        :param ships: iterable of (ship_id, ship_data) pairs, consumed once
+        :return: path of vessels.json
+        """
+        json_file_path = os.path.join(directory, "vessels.json")
+        if self.store:
+            ships = self.store.record(directory, ships)
+        self.write_vessels_json(json_file_path, ships)
+        if self.analytics:
+            self.analytics.update()
+        return json_file_path
+
+    def load_vessels(self, directory):
+        """Vessels of a run from the snapshot store, or from its vessels.json if the run is not stored."""
+        data = self.store.load(directory) if self.store else None
+        if data is None:
+            with open(os.path.join(directory, "vessels.json"), 'r', encoding='utf-8') as file:
+                data = json.load(file)
+        return data
 
-                if not self.is_valid_ship(ship1) or not self.is_valid_ship(ship2):
-                    continue
+    def load_vessel_table(self, directory):
+        """
+        Typed vessels of a run as parsed when the run was stored, for pairing and maps.
+        Only runs missing from the snapshot store are parsed again from their vessels.json.
+        """
+        from vessel import VesselTable
+
+        vessels = self.store.vessel_table(directory) if self.store else None
+        if vessels is None:
+            vessels = VesselTable.from_vessels(self.load_vessels(directory))
+        return vessels
 
-                lat1, lon1 = self.convert_coordinates(ship1["Latitude"]), self.convert_coordinates(ship1["Longitude"])
-                lat2, lon2 = self.convert_coordinates(ship2["Latitude"]), self.convert_coordinates(ship2["Longitude"])
+    def write_vessels_json(self, json_file_path, ships):
+        """
+        Streams (ship_id, ship_data) pairs into a JSON file, with the same output as json.dump(dict(ships), indent=4).
+        """
+        with open(json_file_path, 'w', encoding='utf-8') as file:
+            separator = '{\n    '
+            for ship_id, ship_data in ships:
+                file.write(separator + json.dumps(ship_id) + ': ' + json.dumps(ship_data, indent=4).replace('\n', '\n    '))
+                separator = ',\n    '
+            file.write('{}' if separator.startswith('{') else '\n}')
 
-                size1 = ship1.get("Size", "0 x 0") if ship1.get("Size", "---") not in ['---', '0 m'] else "0 x 0"
-                size2 = ship2.get("Size", "0 x 0") if ship2.get("Size", "---") not in ['---', '0 m'] else "0 x 0"
+    def pair_nearby_ships(self, directory, distance_threshold=75, speed_threshold=None, columns=None, file_format='xlsx'):
+        from pairing import PairingEngine
 
-                distance = self.calculate_rectangle_distance(lat1, lon1, size1, lat2, lon2, size2)
+        vessels = self.load_vessel_table(directory)
 
-                if distance <= distance_threshold:
-                    if speed_threshold:
-                        speed1 = float(ship1.get("Speed", "0").split()[0])
-                        speed2 = float(ship2.get("Speed", "0").split()[0])
-                        if speed1 <= speed_threshold and speed2 <= speed_threshold:
-                            paired_ships.append((ships[i], ships[j], distance))
-                    else:
-                        paired_ships.append((ships[i], ships[j], distance))
+        with self.metrics.stage('pairing'):
+            paired_ships = PairingEngine(self).find_pairs(vessels, distance_threshold, speed_threshold)
+        self.save_paired_ships(paired_ships, self.load_vessels(directory), directory, columns, file_format)
+        return paired_ships
 
-        self.save_paired_ships(paired_ships, data, directory)
+    def detect_rendezvous(self, directory, distance_threshold=500, speed_threshold=2.0, min_hours=2.0, max_gap_hours=6.0,
+                          start=None, end=None):
+        """
+        Replays the recorded runs of every area in time order and saves the encounters of ships that stayed
+        close at low speed for at least min_hours to rendezvous.xlsx in directory. Each area is replayed on
+        its own, so runs of other areas in between do not look like gaps in an encounter.
+        :param max_gap_hours: a pair missing from the runs for longer than this starts a new encounter
+        :param start, end: time window of the runs to replay, datetimes or Unix timestamps
+        :return: list of Encounter
+        """
+        from rendezvous import RendezvousDetector
+
+        encounters = []
+        for directories in self.runs_by_area().values():
+            detector = RendezvousDetector(distance_threshold, speed_threshold, min_hours * 3600,
+                                          max_gap=max_gap_hours * 3600)
+            for started, ships in self.store.snapshots(start, end, directories):
+                encounters.extend(detector.update(started, ships))
+            encounters.extend(detector.flush())
+        encounters.sort(key=lambda encounter: (encounter.start, encounter.ship1, encounter.ship2))
+
+        if encounters:
+            excel_file_name = os.path.join(directory, "rendezvous.xlsx")
+            rows = [encounter.to_dict() for encounter in encounters]
+            write_rows(excel_file_name, list(rows[0]), (list(row.values()) for row in rows))
+            print(f"{len(encounters)} Treffen gefunden und in {excel_file_name} gespeichert.")
+        else:
+            print("Keine Treffen gefunden.")
+        return encounters
+
+    def runs_by_area(self):
+        """
+        Stored run directories grouped by the selected_area.geojson saved with them. Runs without one,
+        e.g. reprocessed runs of older versions, form one group.
+        :return: dict of area GeoJSON text (None for no area) -> list of run directories
+        """
+        areas = {}
+        for run_directory, _ in self.store.runs():
+            try:
+                with open(os.path.join(run_directory, 'selected_area.geojson'), 'r', encoding='utf-8') as file:
+                    area = json.dumps(json.load(file), sort_keys=True)
+            except (OSError, ValueError):
+                area = None
+            areas.setdefault(area, []).append(run_directory)
+        return areas
+
+    def port_report(self, directory, days=90, file_format='xlsx'):
+        """
+        Saves the ports called at during the last `days` days by the vessels seen in the selected area
+        of a run to port_calls.<file_format> in directory: calls, vessels and time in port per port.
+        Without selected_area.geojson the vessels of the run itself are used.
+        :return: rows as returned by PortAnalytics.port_summary
+        """
+        self.analytics.update()
+        start = time.time() - days * 86400
+        geojson_path = os.path.join(directory, 'selected_area.geojson')
+        if os.path.exists(geojson_path):
+            ship_ids = self.store.vessels_in_area(self.area_from_file(geojson_path)['shape'], start)
+        else:
+            ship_ids = list(self.load_vessels(directory))
+        rows = self.analytics.port_summary(ship_ids, start)
+        if rows:
+            file_name = os.path.join(directory, f"port_calls.{file_format}")
+            write_rows(file_name, list(rows[0]), (list(row.values()) for row in rows))
+            print(f"{len(rows)} Häfen mit Anläufen von {len(ship_ids)} Schiffen in {file_name} gespeichert.")
+        else:
+            print("Keine Hafenanläufe im Zeitraum gefunden.")
+        return rows
 
     def is_valid_ship(self, ship):
         return ship.get("IMO", "").replace("'", "").isdigit()
@@ -247,91 +643,34 @@ class ShipDataAnalyzer:
         :param size2: size of the second ship (length x width in meters)
         :return: minimal distance between the two rectangles
         """
-        def parse_size(size):
-            size = size.replace(' m', '')
-            parts = size.split(' x ')
-            if len(parts) == 1:
-                length = float(parts[0])
-                width = 0
-            else:
-                length, width = map(float, parts)
-            return length, width
-
-        if size1 == '---' or size1 == '0 m':
-            size1 = '0 x 0'
-        if size2 == '---' or size2 == '0 m':
-            size2 = '0 x 0'
+        from geo import parse_size, rectangle_distance
 
         length1, width1 = parse_size(size1)
         length2, width2 = parse_size(size2)
+        return rectangle_distance(lat1, lon1, length1, width1, lat2, lon2, length2, width2)
 
-        # Convert size from meters to degrees (approximation)
-        lat1_offset = length1 / 111320  # 1 degree latitude is approx 111.32 km
-        lon1_offset = width1 / (111320 * cos(radians(lat1)))
-
-        lat2_offset = length2 / 111320
-        lon2_offset = width2 / (111320 * cos(radians(lat2)))
-
-        corners1 = [
-            (lat1 + lat1_offset / 2, lon1 + lon1_offset / 2),
-            (lat1 + lat1_offset / 2, lon1 - lon1_offset / 2),
-            (lat1 - lat1_offset / 2, lon1 + lon1_offset / 2),
-            (lat1 - lat1_offset / 2, lon1 - lon1_offset / 2),
-        ]
-
-        corners2 = [
-            (lat2 + lat2_offset / 2, lon2 + lon2_offset / 2),
-            (lat2 + lat2_offset / 2, lon2 - lon2_offset / 2),
-            (lat2 - lat2_offset / 2, lon2 + lon2_offset / 2),
-            (lat2 - lat2_offset / 2, lon2 - lon2_offset / 2),
-        ]
-
-        min_distance = float('inf')
-        for corner1 in corners1:
-            for corner2 in corners2:
-                distance = self.calculate_distance(corner1[0], corner1[1], corner2[0], corner2[1])
-                if distance < min_distance:
-                    min_distance = distance
+    def calculate_distance(self, lat1, lon1, lat2, lon2):
+        from geo import haversine
 
-        return min_distance
+        return haversine(lat1, lon1, lat2, lon2)
 
-    def calculate_distance(self, lat1, lon1, lat2, lon2):
-        R = 6371000
-        lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-        dlat = lat2 - lat1
-        dlon = lon2 - lon1
-        a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-        c = 2 * atan2(sqrt(a), sqrt(1-a))
-        return R * c
-
-    def save_paired_ships(self, paired_ships, data, directory):
-        paired_ships_data = []
-        for pair in paired_ships:
-            ship1_info = data[pair[0]]
-            ship2_info = data[pair[1]]
-            distance = pair[2]
-            paired_ships_data.extend([
-                {"Distance (m)": f"{distance:.2f}"},
-                {"Ship 1": "-----------------------------"},
-                ship1_info,
-                {"Ship 2": "-----------------------------"},
-                ship2_info,
-                {},
-                {}
-            ])
-
-        if paired_ships_data:
-            df = pd.DataFrame(paired_ships_data)
-            excel_file_name = os.path.join(directory, "paired_ships.xlsx")
-            df.to_excel(excel_file_name, index=False)
-            print(f"Paired ships saved as {excel_file_name}")
-        else:
+    @timed('pair_export')
+    def save_paired_ships(self, paired_ships, data, directory, columns=None, file_format='xlsx'):
+        """
+        Streams one flat row per pair (distance, then the selected columns of both ships) into paired_ships.<file_format>.
+        :param columns: vessel columns per ship, see export.VESSEL_COLUMNS; all if None
+        :param file_format: 'xlsx', 'csv' or 'parquet'
+        """
+        if not paired_ships:
             print("No ships found within the specified thresholds.")
+            return
+        columns = select_columns(columns)
+        file_name = os.path.join(directory, f"paired_ships.{file_format}")
+        write_rows(file_name, pair_columns(columns), pair_rows(paired_ships, data, columns))
+        print(f"Paired ships saved as {file_name}")
 
     def clean_directory(self, directory):
-        json_file_path = os.path.join(directory, "vessels.json")
-        with open(json_file_path, 'r', encoding='utf-8') as file:
-            vessels_data = json.load(file)
+        vessels_data = self.load_vessels(directory)
 
         filtered_vessels_data = {}
         for vessel_id, vessel_info in vessels_data.items():
@@ -342,9 +681,13 @@ class ShipDataAnalyzer:
                 html_file_path = os.path.join(directory, f"{vessel_id}.html")
                 if os.path.exists(html_file_path):
                     os.remove(html_file_path)
+        if PageArchive.exists(directory):
+            try:
+                self.page_archive(directory).compact(filtered_vessels_data)
+            finally:
+                self.close_archive(directory)
 
-        with open(json_file_path, 'w', encoding='utf-8') as file:
-            json.dump(filtered_vessels_data, file, indent=4)
+        self.save_vessels(directory, filtered_vessels_data.items())
 
         print(f"Cleaned directory '{directory}' and updated 'vessels.json'")
 
@@ -372,32 +715,34 @@ class ShipDataAnalyzer:
                 data.append({columns[i]: cols[i].text.strip() for i in range(len(columns))})
         return data
 
-    def convert_json_to_excel(self, json_file_name):
-        with open(json_file_name, 'r') as file:
-            data = json.load(file)
+    @timed('export')
+    def convert_json_to_excel(self, json_file_name, columns=None, exclude=None, file_format='xlsx'):
+        """
+        Exports a vessels.json as a table, streaming one row per ship.
+        :param columns: columns to export, see export.VESSEL_COLUMNS; all if None
+        :param exclude: columns to leave out
+        :param file_format: 'xlsx', 'csv' or 'parquet'; the file is written next to the JSON file
+        """
+        if os.path.basename(json_file_name) == "vessels.json":
+            data = self.load_vessels(os.path.dirname(json_file_name))
+        else:
+            with open(json_file_name, 'r') as file:
+                data = json.load(file)
 
         if not isinstance(data, dict):
             print("Invalid JSON structure.")
             return
 
-        flattened_data = [{'ship_id': ship_id, **ship_info} for ship_id, ship_info in data.items()]
-        df = pd.DataFrame(flattened_data)
-
-        print("Available attributes:")
-        for i, col in enumerate(df.columns):
-            print(f"{i + 1}: {col}")
-
-        exclude_indices = input("Enter the numbers of the attributes to exclude, separated by commas: ").split(',')
-        exclude_indices = [int(index.strip()) - 1 for index in exclude_indices if index.strip().isdigit()]
+        columns = select_columns(columns, exclude)
+        output_file_name = os.path.splitext(json_file_name)[0] + "." + file_format
+        write_rows(output_file_name, columns, vessel_rows(data.items(), columns))
+        print(f"{file_format.upper()} file saved as {output_file_name}")
 
-        columns_to_include = [col for i, col in enumerate(df.columns) if i not in exclude_indices]
-        df_filtered = df[columns_to_include]
-
-        excel_file_name = json_file_name.replace(".json", ".xlsx")
-        df_filtered.to_excel(excel_file_name, index=False)
-        print(f"Excel file saved as {excel_file_name}")
-    
     def create_map_html(self, directory, selected_area):
+        import folium
+        from folium import plugins
+        from shapely.geometry import Point
+
         shape = selected_area['shape']
         bounds = shape.bounds
         center_lat = (bounds[1] + bounds[3]) / 2
@@ -423,13 +768,74 @@ class ShipDataAnalyzer:
         map_path = os.path.join(directory, 'selected_area_map.html')
         m.save(map_path)
 
+    @timed('map')
+    def create_fleet_map(self, directory, pairs=None, distance_threshold=75, speed_threshold=None):
+        """
+        Renders all vessels of a run, clustered in one layer per vessel type, and the pairs as connector
+        lines to fleet_map.html in directory. The selected area is outlined if the run has its GeoJSON.
+        :param pairs: result of pair_nearby_ships, computed with the thresholds if None
+        :return: path of the map
+        """
+        from fleet_map import fleet_map
+        from pairing import PairingEngine
+
+        vessels = self.load_vessel_table(directory)
+        if pairs is None:
+            pairs = PairingEngine(self).find_pairs(vessels, distance_threshold, speed_threshold)
+        geojson_path = os.path.join(directory, 'selected_area.geojson')
+        selected_area = self.area_from_file(geojson_path) if os.path.exists(geojson_path) else None
+
+        m, vessel_count, pair_count = fleet_map(vessels, pairs, selected_area)
+        map_path = os.path.join(directory, 'fleet_map.html')
+        m.save(map_path)
+        print(f"Flottenkarte mit {vessel_count} Schiffen und {pair_count} Paaren in {map_path} gespeichert.")
+        return map_path
+
+    def create_track_map(self, ship_ids, map_path, start=None, end=None, tolerance=0.0002):
+        """
+        Renders the stored tracks of the given vessels as lines on a folium map.
+        :param start, end: time window as datetimes or Unix timestamps, open if None
+        :param tolerance: simplification tolerance in degrees, keeps long tracks light in the browser
+        :return: number of vessels with a track in the window
+        """
+        import folium
+        from folium import plugins
+        from shapely.geometry import LineString
+
+        m = folium.Map(tiles='OpenStreetMap')
+        drawn = 0
+        for ship_id in ship_ids:
+            track = self.store.track(ship_id, start, end)
+            if not track:
+                continue
+            points = [(lat, lon) for _, lat, lon, _, _ in track]
+            if len(points) > 1:
+                points = list(LineString(points).simplify(tolerance).coords)
+                folium.PolyLine(points, weight=2, tooltip=str(ship_id)).add_to(m)
+            last_time, last_lat, last_lon, _, _ = track[-1]
+            folium.CircleMarker(location=[last_lat, last_lon], radius=3, fill=True,
+                                popup=f"{ship_id}<br>{datetime.fromtimestamp(last_time):%Y-%m-%d %H:%M}").add_to(m)
+            drawn += 1
+        if drawn:
+            m.fit_bounds(m.get_bounds())
+        plugins.Fullscreen().add_to(m)
+        m.save(map_path)
+        return drawn
+
     def save_geojson(self, directory, selected_area):
+        if 'radius_km' in selected_area:
+            # Same form as index.html writes, so parse_geojson_area restores the exact circle
+            geometry = {"type": "Point", "coordinates": list(selected_area['center'])}
+            properties = {"radius": selected_area['radius_km']}
+        else:
+            geometry = selected_area['shape'].__geo_interface__
+            properties = {}
         geojson = {
             "type": "FeatureCollection",
             "features": [{
                 "type": "Feature",
-                "geometry": selected_area['shape'].__geo_interface__,
-                "properties": {}
+                "geometry": geometry,
+                "properties": properties
             }]
         }
         
@@ -438,6 +844,8 @@ class ShipDataAnalyzer:
             json.dump(geojson, f)
     
     def plot_area_interactive(self, center_lat, center_lon, inner_radius_km, outer_radius_km, directory):
+        import folium
+
         map = folium.Map(location=[center_lat, center_lon], zoom_start=12, tiles='OpenStreetMap')
         folium.Circle(
             radius=outer_radius_km * 1000,
@@ -464,21 +872,27 @@ class ShipDataAnalyzer:
         map.save(map_path)
         webbrowser.open(map_path)
 
-    def execute_all_tasks(self, directory, selected_area, distance_threshold=50, speed_threshold=None):
+    def execute_all_tasks(self, directory, selected_area, distance_threshold=50, speed_threshold=None, exclude=None):
         ships = self.get_ships_in_area(selected_area)
-        vessels = {}
-        for ship_id in ships:
-            ship_data = self.get_ship_data(ship_id, directory)
-            if ship_data:
-                vessels[ship_id] = ship_data
-        json_file_path = os.path.join(directory, "vessels.json")
-        with open(json_file_path, 'w') as file:
-            json.dump(vessels, file, indent=4)
-        self.convert_json_to_excel(json_file_path)
-        self.pair_nearby_ships(directory, distance_threshold, speed_threshold)
+        vessels = self.fetch_all_ship_data(ships, directory)
+        json_file_path = self.save_vessels(directory, vessels.items())
+        self.convert_json_to_excel(json_file_path, exclude=exclude)
+        paired_ships = self.pair_nearby_ships(directory, distance_threshold, speed_threshold)
+        self.create_fleet_map(directory, paired_ships)
+
+    def save_metrics(self, directory, prometheus=False):
+        """
+        Writes the metrics collected since the last call to metrics.json (and metrics.prom) in the run directory
+        and starts over, so every run gets its own numbers. Does nothing while metrics are disabled.
+        """
+        path = self.metrics.save(directory, prometheus)
+        if path:
+            print(f"Messwerte in {path} gespeichert.")
+        self.metrics.reset()
+        return path
 
 def main():
-    analyzer = ShipDataAnalyzer()
+    analyzer = ShipDataAnalyzer(metrics=True)
     def print_header():
         clear_screen()
         print(Fore.BLUE + Style.BRIGHT + "=" * 50)
@@ -489,22 +903,34 @@ def main():
         print("1. Herunterladen und Speichern von Schiffsdaten")
         print("2. Konvertieren von JSON zu Excel")
         print("3. Paaren von nahegelegenen Schiffen")
-        print("4. Verarbeiten von HTML-Dateien im Verzeichnis")
+        print("4. Verarbeiten der Schiffsseiten im Verzeichnis")
         print("5. Alle Aufgaben ausführen")
         print("6. Verzeichnis bereinigen")
-        print("7. Beenden")
+        print("7. Flottenkarte erstellen")
+        print("8. Beenden")
         print(Style.RESET_ALL)
     def user_choice():
         print_menu()
-        return int(input(Fore.YELLOW + "Geben Sie Ihre Wahl ein (1-7): " + Style.RESET_ALL))
+        return int(input(Fore.YELLOW + "Geben Sie Ihre Wahl ein (1-8): " + Style.RESET_ALL))
 
     def clear_screen():
         os.system('cls' if os.name == 'nt' else 'clear')
+
+    def ask_excluded_columns():
+        print("Available attributes:")
+        for i, col in enumerate(VESSEL_COLUMNS):
+            print(f"{i + 1}: {col}")
+        exclude_indices = input("Enter the numbers of the attributes to exclude, separated by commas: ").split(',')
+        exclude_indices = [int(index.strip()) - 1 for index in exclude_indices if index.strip().isdigit()]
+        return [col for i, col in enumerate(VESSEL_COLUMNS) if i in exclude_indices]
     while True:
         colorama.init()
         print_header()
         action = user_choice()
-        
+        # Every action gets its own metrics, saved to the directory it worked on
+        analyzer.metrics.reset()
+        directory = None
+
         if action == 1 or action == 5:
             print(Fore.CYAN + "\nÖffne die Karte zur Bereichsauswahl..." + Style.RESET_ALL)
             analyzer.open_html_page()
@@ -515,43 +941,45 @@ def main():
                 print(Fore.CYAN + "\nLade Schiffsdaten..." + Style.RESET_ALL)
                 ships = analyzer.get_ships_in_area(selected_area)
                 directory = analyzer.setup_directory(selected_area)
-                vessels = {}
-                for ship_id in ships:
-                    ship_data = analyzer.get_ship_data(ship_id, directory)
-                    if ship_data:
-                        vessels[ship_id] = ship_data
-                json_file_path = os.path.join(directory, "vessels.json")
-                with open(json_file_path, 'w') as file:
-                    json.dump(vessels, file, indent=4)
+                vessels = analyzer.fetch_all_ship_data(ships, directory)
+                json_file_path = analyzer.save_vessels(directory, vessels.items())
                 print(Fore.GREEN + f"\nSchiffsdaten wurden in {json_file_path} gespeichert." + Style.RESET_ALL)
             elif action == 5:
                 distance_threshold = float(input(Fore.YELLOW + "\nGeben Sie den Abstandsschwellenwert in Metern für die Gruppierung ein (Standard: 75): " + Style.RESET_ALL) or 75)
                 speed_threshold = float(input(Fore.YELLOW + "Geben Sie den Geschwindigkeitsschwellenwert in Knoten für die Gruppierung ein (optional): " + Style.RESET_ALL) or 0)
+                exclude = ask_excluded_columns()
                 print(Fore.CYAN + "\nFühre alle Aufgaben aus..." + Style.RESET_ALL)
                 directory = analyzer.setup_directory(selected_area)
-                analyzer.execute_all_tasks(directory, selected_area, distance_threshold, speed_threshold)
+                analyzer.execute_all_tasks(directory, selected_area, distance_threshold, speed_threshold, exclude)
 
 
         elif action == 2:
             directory = input(Fore.YELLOW + "\nGeben Sie das Verzeichnis mit der JSON-Datei ein: " + Style.RESET_ALL)
-            analyzer.convert_json_to_excel(os.path.join(directory, "vessels.json"))
+            analyzer.convert_json_to_excel(os.path.join(directory, "vessels.json"), exclude=ask_excluded_columns())
         elif action == 3:
             directory = input(Fore.YELLOW + "\nGeben Sie das Verzeichnis mit der JSON-Datei ein: " + Style.RESET_ALL)
             distance_threshold = float(input(Fore.YELLOW + f"Geben Sie den Abstandsschwellenwert in Metern für das Paaren ein (Standard: 75): " + Style.RESET_ALL) or 75)
             speed_threshold = float(input(Fore.YELLOW + "Geben Sie den Geschwindigkeitsschwellenwert in Knoten für das Paaren ein (optional): " + Style.RESET_ALL) or 0)
             analyzer.pair_nearby_ships(directory, distance_threshold, speed_threshold)
         elif action == 4:
-            directory = input(Fore.YELLOW + "\nGeben Sie das Verzeichnis mit den HTML-Dateien ein: " + Style.RESET_ALL)
+            directory = input(Fore.YELLOW + "\nGeben Sie das Laufverzeichnis (oder ein Verzeichnis mit mehreren Läufen) ein: " + Style.RESET_ALL)
             analyzer.process_html_files_in_directory(directory)
         elif action == 6:
             directory = input(Fore.YELLOW + "\nGeben Sie das zu bereinigende Verzeichnis ein: " + Style.RESET_ALL)
             analyzer.clean_directory(directory)
         elif action == 7:
+            directory = input(Fore.YELLOW + "\nGeben Sie das Verzeichnis mit der JSON-Datei ein: " + Style.RESET_ALL)
+            distance_threshold = float(input(Fore.YELLOW + "Geben Sie den Abstandsschwellenwert in Metern für das Paaren ein (Standard: 75): " + Style.RESET_ALL) or 75)
+            speed_threshold = float(input(Fore.YELLOW + "Geben Sie den Geschwindigkeitsschwellenwert in Knoten für das Paaren ein (optional): " + Style.RESET_ALL) or 0)
+            analyzer.create_fleet_map(directory, distance_threshold=distance_threshold, speed_threshold=speed_threshold)
+        elif action == 8:
             print(Fore.GREEN + "\nProgramm wird beendet." + Style.RESET_ALL)
             break
         else:
             print(Fore.RED + "\nUngültige Auswahl. Bitte versuchen Sie es erneut." + Style.RESET_ALL)
 
+        if directory and os.path.isdir(directory):
+            analyzer.save_metrics(directory)
         input(Fore.YELLOW + "\nDrücken Sie Enter, um fortzufahren..." + Style.RESET_ALL)
 
 if __name__ == "__main__":
@@ -0,0 +1,147 @@
+from datetime import datetime
+
+import numpy as np
+
+from geo import rectangle_distance_np
+from pairing import MAX_HALF_DIAGONAL, GridIndex
+
+
+class Encounter:
+    """Two ships staying within the distance threshold of each other at low speed."""
+
+    __slots__ = ('ship1', 'ship2', 'start', 'last_seen', 'min_distance', 'speed_sum', 'samples')
+
+    def __init__(self, ship1, ship2, t, distance, speed):
+        self.ship1 = ship1
+        self.ship2 = ship2
+        self.start = t
+        self.last_seen = t
+        self.min_distance = distance
+        self.speed_sum = speed
+        self.samples = 1
+
+    def observe(self, t, distance, speed):
+        self.last_seen = t
+        self.min_distance = min(self.min_distance, distance)
+        self.speed_sum += speed
+        self.samples += 1
+
+    @property
+    def duration(self):
+        return self.last_seen - self.start
+
+    @property
+    def mean_speed(self):
+        return self.speed_sum / self.samples
+
+    def to_dict(self):
+        return {
+            'ship1': self.ship1,
+            'ship2': self.ship2,
+            'start': datetime.fromtimestamp(self.start).isoformat(timespec='seconds'),
+            'duration_h': round(self.duration / 3600, 2),
+            'min_distance': round(self.min_distance, 2),
+            'mean_speed': round(self.mean_speed, 2),
+            'samples': self.samples,
+        }
+
+
+class RendezvousDetector:
+    """
+    Follows close, slow pairs of ships across successive snapshots and reports encounters that lasted
+    at least min_duration seconds.
+
+    Ships are kept in a grid index that is only updated for ships that moved, appeared or vanished.
+    A ship missing from a snapshot keeps its state and open encounters, but is only paired again once
+    it reappears; it is dropped after max_gap seconds without being seen, and an encounter ends once
+    the pair has not been seen close together for max_gap seconds.
+    """
+
+    def __init__(self, distance_threshold=500, speed_threshold=2.0, min_duration=2 * 3600, max_gap=3600,
+                 max_lat=85.0, on_encounter=None):
+        self.distance_threshold = distance_threshold
+        self.speed_threshold = speed_threshold
+        self.min_duration = min_duration
+        self.max_gap = max_gap
+        self.on_encounter = on_encounter
+        self.ships = {}
+        self.last_seen = {}
+        self.active = {}
+        reach = (distance_threshold + 2 * MAX_HALF_DIAGONAL) * 1.01 + 1.0
+        self.grid = GridIndex([], [], reach, max_lat=max_lat)
+
+    def update(self, t, ships):
+        """
+        Consumes one snapshot.
+        :param t: Unix time of the snapshot, not older than the previous one
+        :param ships: dict of ship id -> (lat, lon, length, width, speed)
+        :return: list of encounters that ended with this snapshot and lasted at least min_duration
+        """
+        self.move(t, ships)
+        first, second, distances = self.close_pairs(ships)
+        seen = set()
+        for ship1, ship2, distance in zip(first, second, distances):
+            key = (ship1, ship2)
+            pair_speed = (self.ships[ship1][4] + self.ships[ship2][4]) / 2
+            if key in self.active:
+                self.active[key].observe(t, distance, pair_speed)
+            else:
+                self.active[key] = Encounter(ship1, ship2, t, distance, pair_speed)
+            seen.add(key)
+
+        expired = [key for key, encounter in self.active.items()
+                   if key not in seen and t - encounter.last_seen > self.max_gap]
+        return self.finish(expired)
+
+    def flush(self):
+        """Ends all open encounters, e.g. at the end of a replay. :return: those that lasted long enough"""
+        return self.finish(list(self.active))
+
+    def ongoing(self):
+        """Open encounters that already lasted at least min_duration."""
+        return [encounter for encounter in self.active.values() if encounter.duration >= self.min_duration]
+
+    def move(self, t, ships):
+        for ship_id in [ship_id for ship_id, seen in self.last_seen.items()
+                        if ship_id not in ships and t - seen > self.max_gap]:
+            lat, lon = self.ships.pop(ship_id)[:2]
+            self.grid.remove(ship_id, lat, lon)
+            del self.last_seen[ship_id]
+        for ship_id, ship in ships.items():
+            self.last_seen[ship_id] = t
+            previous = self.ships.get(ship_id)
+            if previous is not None and previous[:2] == ship[:2]:
+                self.ships[ship_id] = ship
+                continue
+            if previous is not None:
+                self.grid.remove(ship_id, previous[0], previous[1])
+            self.grid.add(ship_id, ship[0], ship[1])
+            self.ships[ship_id] = ship
+
+    def close_pairs(self, ships):
+        """:return: (first ids, second ids, distances) of all slow pairs within the distance threshold, both in ships"""
+        first, second = [], []
+        for ship_id, ship in ships.items():
+            if not ship[4] <= self.speed_threshold:
+                continue
+            for other in self.grid.query(ship[0], ship[1]):
+                if ship_id < other and other in ships and ships[other][4] <= self.speed_threshold:
+                    first.append(ship_id)
+                    second.append(other)
+        if not first:
+            return [], [], []
+        a = np.array([self.ships[ship_id] for ship_id in first], dtype=float)
+        b = np.array([self.ships[ship_id] for ship_id in second], dtype=float)
+        distances = rectangle_distance_np(a[:, 0], a[:, 1], a[:, 2], a[:, 3], b[:, 0], b[:, 1], b[:, 2], b[:, 3])
+        keep = np.flatnonzero(distances <= self.distance_threshold).tolist()
+        return [first[i] for i in keep], [second[i] for i in keep], distances[keep].tolist()
+
+    def finish(self, keys):
+        finished = []
+        for key in keys:
+            encounter = self.active.pop(key)
+            if encounter.duration >= self.min_duration:
+                finished.append(encounter)
+                if self.on_encounter:
+                    self.on_encounter(encounter)
+        return finished
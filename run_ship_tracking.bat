@@ -7,6 +7,7 @@ pip install beautifulsoup4
 pip install pandas
 pip install geopandas
 pip install shapely
+pip install numpy
 pip install colorama
 pip install openpyxl
 
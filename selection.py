@@ -0,0 +1,73 @@
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SELECTION_PATH = '/selected-area'
+
+
+class AreaSelectionServer:
+    """
+    Serves index.html on a local port and receives the confirmed area as a POST from the page,
+    so the program is woken up as soon as the user confirms instead of polling the download folder.
+    """
+
+    def __init__(self, page_path, host='127.0.0.1', port=0):
+        self.page_path = page_path
+        self.selected = None
+        self.received = threading.Event()
+        self.server = ThreadingHTTPServer((host, port), self.handler_class())
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/{os.path.basename(self.page_path)}"
+
+    def handler_class(self):
+        selection = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/' + os.path.basename(selection.page_path)):
+                    self.send_error(404)
+                    return
+                with open(selection.page_path, 'rb') as file:
+                    body = file.read()
+                self.respond(200, 'text/html; charset=utf-8', body)
+
+            def do_POST(self):
+                if self.path != SELECTION_PATH:
+                    self.send_error(404)
+                    return
+                try:
+                    data = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                except ValueError:
+                    self.send_error(400)
+                    return
+                selection.selected = data
+                selection.received.set()
+                self.respond(200, 'application/json', b'{"ok": true}')
+
+            def respond(self, status, content_type, body):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def wait(self, timeout=None):
+        """Blocks until the page posts an area. :return: the GeoJSON dict, or None on timeout"""
+        if not self.received.wait(timeout):
+            return None
+        return self.selected
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,293 @@
+import os
+import re
+import sqlite3
+import time
+from datetime import datetime, timezone
+
+from extractor import FIELDS, TABLES
+
+# numpy, shapely and the vessel model are imported by the methods that need them, so that loading
+# and exporting stored runs does not pay for them at startup
+
+STORE_FILE = 'snapshots.sqlite'
+RUN_DIRECTORY_FORMAT = 'data_%Y-%m-%d_%H-%M-%S'
+
+# vessels.json field -> text column holding the value as extracted
+FIELD_COLUMNS = {field: re.sub(r'\W+', '_', field.lower()) for field in FIELDS}
+
+# Typed column -> Vessel attribute it holds, filled once when a snapshot is recorded
+TYPED_COLUMNS = {
+    'lat': 'lat',
+    'lon': 'lon',
+    'speed_kn': 'speed',
+    'course_deg': 'course',
+    'draught_m': 'draught',
+    'dwt_t': 'dwt',
+    'gross_tonnage': 'gross_tonnage',
+    'build_year': 'build_year',
+    'length_m': 'length',
+    'width_m': 'width',
+    'imo_number': 'imo',
+    'trip_distance_nm': 'trip_distance',
+    'average_speed_kn': 'average_speed',
+    'maximum_speed_kn': 'maximum_speed',
+}
+# Text column -> Vessel attribute of the categorical fields, see vessel.CATEGORY_FIELDS
+CATEGORY_COLUMNS = {'type': 'type', 'flag': 'flag', 'area': 'area', 'status': 'status'}
+
+# vessels.json table -> child table name
+TABLE_NAMES = {
+    'Most Visited Ports': 'visited_ports',
+    'Last Trips': 'trips',
+    'Port Calls': 'port_calls',
+}
+
+RECEIVED = re.compile(r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}')
+
+
+def run_time(directory):
+    """Start of a run as a Unix timestamp, taken from its data_<timestamp> name, or now for other directories."""
+    try:
+        return datetime.strptime(os.path.basename(os.path.abspath(directory)), RUN_DIRECTORY_FORMAT).timestamp()
+    except ValueError:
+        return time.time()
+
+
+def position_time(received, fallback):
+    """Unix timestamp of a 'Position Received' value like '2024-05-01 12:00 UTC', fallback if it has none."""
+    match = RECEIVED.search(received or '')
+    if not match:
+        return fallback
+    return datetime.strptime(match.group(), '%Y-%m-%d %H:%M').replace(tzinfo=timezone.utc).timestamp()
+
+
+def timestamp(value):
+    """Accepts datetimes or Unix timestamps for time windows."""
+    return value.timestamp() if isinstance(value, datetime) else value
+
+
+class SnapshotStore:
+    """
+    All vessel snapshots of all runs in one SQLite database, one row per vessel and run.
+
+    Every extracted field is kept as text so a run's vessels.json can be restored exactly,
+    next to typed columns (position, speed, course, draught, DWT, size, ...) that are parsed once
+    with Vessel.from_data when the snapshot is recorded, and that queries, pairing and maps read.
+    The port and trip tables are child tables keyed by run, ship id (the MMSI) and row position.
+
+    Independently of the runs, every position ever seen is appended to a history keyed by ship id and time,
+    indexed by ship id for tracks and by an R*Tree over (lon, lat, time) for area queries.
+    """
+
+    def __init__(self, path=STORE_FILE):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode = WAL")
+        self.db.execute("PRAGMA mmap_size = 268435456")
+        self.db.execute("PRAGMA foreign_keys = ON")
+        field_columns = ', '.join(f"{column} TEXT" for column in FIELD_COLUMNS.values())
+        typed_columns = ', '.join(f"{column} {'INTEGER' if column == 'imo_number' else 'REAL'}" for column in TYPED_COLUMNS)
+        self.db.execute("CREATE TABLE IF NOT EXISTS runs (id INTEGER PRIMARY KEY, directory TEXT UNIQUE, name TEXT)")
+        self.db.execute(f"""CREATE TABLE IF NOT EXISTS vessels (
+            run_id INTEGER REFERENCES runs (id) ON DELETE CASCADE, ship_id TEXT,
+            {field_columns}, {typed_columns})""")
+        self.db.execute("CREATE UNIQUE INDEX IF NOT EXISTS vessels_run_ship ON vessels (run_id, ship_id)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS vessels_ship_id ON vessels (ship_id)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS vessels_position ON vessels (lat, lon)")
+        for key, (_, columns) in TABLES.items():
+            table = TABLE_NAMES[key]
+            self.db.execute(f"""CREATE TABLE IF NOT EXISTS {table} (
+                run_id INTEGER REFERENCES runs (id) ON DELETE CASCADE, ship_id TEXT, position INTEGER,
+                {', '.join(f'{column} TEXT' for column in columns)})""")
+            self.db.execute(f"CREATE INDEX IF NOT EXISTS {table}_run_ship ON {table} (run_id, ship_id)")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS positions (
+            id INTEGER PRIMARY KEY, ship_id TEXT, t REAL, lat REAL, lon REAL, speed_kn REAL, course_deg REAL,
+            UNIQUE (ship_id, t))""")
+        self.db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS positions_rtree USING rtree (id, min_lon, max_lon, min_lat, max_lat, min_t, max_t)")
+        # Ignored duplicates do not fire the trigger, so the R*Tree only ever sees stored positions
+        self.db.execute("""CREATE TRIGGER IF NOT EXISTS positions_rtree_insert AFTER INSERT ON positions BEGIN
+            INSERT INTO positions_rtree VALUES (new.id, new.lon, new.lon, new.lat, new.lat, new.t, new.t); END""")
+        self.db.commit()
+
+    @staticmethod
+    def typed_values(vessel):
+        return [getattr(vessel, name) for name in TYPED_COLUMNS.values()]
+
+    def run_id(self, directory, create=False):
+        directory = os.path.abspath(directory)
+        row = self.db.execute("SELECT id FROM runs WHERE directory = ?", (directory,)).fetchone()
+        if row or not create:
+            return row[0] if row else None
+        return self.db.execute("INSERT INTO runs (directory, name) VALUES (?, ?)",
+                               (directory, os.path.basename(directory))).lastrowid
+
+    def record(self, directory, ships):
+        """
+        Replaces the snapshot of a run directory with the given ships while passing them through,
+        so it can wrap the stream written to vessels.json. Committed once the stream is exhausted.
+        :param ships: iterable of (MMSI, ship data) pairs
+        """
+        from vessel import Vessel
+
+        started = run_time(directory)
+        with self.db:
+            run_id = self.run_id(directory, create=True)
+            self.db.execute("DELETE FROM runs WHERE id = ?", (run_id,))
+            self.db.execute("INSERT INTO runs (id, directory, name) VALUES (?, ?, ?)",
+                            (run_id, os.path.abspath(directory), os.path.basename(os.path.abspath(directory))))
+            for ship_id, ship_data in ships:
+                self.insert(run_id, ship_id, ship_data, Vessel.from_data(ship_id, ship_data), started)
+                yield ship_id, ship_data
+
+    def insert(self, run_id, ship_id, ship_data, vessel, started):
+        """:param vessel: the Vessel parsed from ship_data, whose values fill the typed columns"""
+        fields = [ship_data.get(field) for field in FIELD_COLUMNS]
+        columns = ['run_id', 'ship_id', *FIELD_COLUMNS.values(), *TYPED_COLUMNS]
+        self.db.execute(f"INSERT INTO vessels ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                        [run_id, ship_id, *fields, *self.typed_values(vessel)])
+        if vessel.has_position:
+            self.db.execute("INSERT OR IGNORE INTO positions (ship_id, t, lat, lon, speed_kn, course_deg) VALUES (?, ?, ?, ?, ?, ?)",
+                            (ship_id, position_time(ship_data.get('Position Received'), started),
+                             vessel.lat, vessel.lon, vessel.speed, vessel.course))
+        for key, (_, columns) in TABLES.items():
+            rows = ship_data.get(key) or []
+            self.db.executemany(f"INSERT INTO {TABLE_NAMES[key]} VALUES ({', '.join('?' * (len(columns) + 3))})",
+                                [(run_id, ship_id, position, *(row.get(column) for column in columns))
+                                 for position, row in enumerate(rows)])
+
+    def has_snapshot(self, directory):
+        return self.run_id(directory) is not None
+
+    def iter_vessels(self, directory):
+        """Lazily yields (MMSI, ship data) of a run in the order they were recorded, as in vessels.json."""
+        run_id = self.run_id(directory)
+        if run_id is None:
+            return
+        children = {key: self.child_rows(TABLE_NAMES[key], columns, run_id) for key, (_, columns) in TABLES.items()}
+        cursor = self.db.execute(f"SELECT ship_id, {', '.join(FIELD_COLUMNS.values())} FROM vessels WHERE run_id = ? ORDER BY rowid", (run_id,))
+        for ship_id, *values in cursor:
+            ship_data = {field: value for field, value in zip(FIELD_COLUMNS, values) if value is not None}
+            for key in TABLES:
+                ship_data[key] = children[key].get(ship_id, [])
+            yield ship_id, ship_data
+
+    def vessel_table(self, directory):
+        """:return: VesselTable of a run read from the typed columns, in recorded order, or None if the run is not stored"""
+        from vessel import Vessel, VesselTable, parse_category
+
+        run_id = self.run_id(directory)
+        if run_id is None:
+            return None
+        table = VesselTable()
+        names = [*TYPED_COLUMNS.values(), *CATEGORY_COLUMNS.values()]
+        cursor = self.db.execute(f"""SELECT ship_id, {', '.join([*TYPED_COLUMNS, *CATEGORY_COLUMNS])}
+            FROM vessels WHERE run_id = ? ORDER BY rowid""", (run_id,))
+        for ship_id, *values in cursor:
+            vessel = Vessel(ship_id, **dict(zip(names, values)))
+            for name in CATEGORY_COLUMNS.values():
+                setattr(vessel, name, parse_category(getattr(vessel, name) or ''))
+            table.append(vessel)
+        return table
+
+    def child_rows(self, table, columns, run_id):
+        rows = {}
+        cursor = self.db.execute(f"SELECT ship_id, {', '.join(columns)} FROM {table} WHERE run_id = ? ORDER BY rowid", (run_id,))
+        for ship_id, *values in cursor:
+            rows.setdefault(ship_id, []).append(dict(zip(columns, values)))
+        return rows
+
+    def load(self, directory):
+        """:return: vessels dict of a run, equal to its vessels.json, or None if the run is not stored"""
+        if not self.has_snapshot(directory):
+            return None
+        return dict(self.iter_vessels(directory))
+
+    def runs(self):
+        """:return: list of (run directory, number of vessels), oldest run first"""
+        return self.db.execute("""SELECT runs.directory, COUNT(vessels.ship_id) FROM runs
+            LEFT JOIN vessels ON vessels.run_id = runs.id GROUP BY runs.id ORDER BY runs.name""").fetchall()
+
+    def vessel_history(self, ship_id):
+        """:return: (run name, lat, lon, speed, course, draught) of one vessel in every run it was seen in"""
+        return self.db.execute("""SELECT runs.name, lat, lon, speed_kn, course_deg, draught_m FROM vessels
+            JOIN runs ON runs.id = vessels.run_id WHERE ship_id = ? ORDER BY runs.name""", (ship_id,)).fetchall()
+
+    def vessels_in_box(self, minlat, minlon, maxlat, maxlon, max_speed=None):
+        """:return: (run name, MMSI, lat, lon, speed) of all stored vessels inside the box, across all runs"""
+        query = """SELECT runs.name, ship_id, lat, lon, speed_kn FROM vessels JOIN runs ON runs.id = vessels.run_id
+            WHERE lat BETWEEN ? AND ? AND lon BETWEEN ? AND ?"""
+        params = [minlat, maxlat, minlon, maxlon]
+        if max_speed is not None:
+            query += " AND speed_kn <= ?"
+            params.append(max_speed)
+        return self.db.execute(query + " ORDER BY runs.name, ship_id", params).fetchall()
+
+    def snapshots(self, start=None, end=None, directories=None):
+        """
+        Replays the recorded runs in time order, for detectors that consume successive snapshots.
+        :param directories: run directories to replay, e.g. the runs of one area; all runs if None
+        :return: iterator of (Unix time, dict of ship id -> (lat, lon, length, width, speed)) per run
+        """
+        start, end = self.window(start, end)
+        if directories is not None:
+            directories = {os.path.abspath(directory) for directory in directories}
+        runs = sorted((run_time(directory), run_id) for run_id, directory in self.db.execute("SELECT id, directory FROM runs")
+                      if directories is None or directory in directories)
+        for started, run_id in runs:
+            if not start <= started <= end:
+                continue
+            ships = {}
+            for ship_id, lat, lon, length, width, speed in self.db.execute(
+                    "SELECT ship_id, lat, lon, length_m, width_m, speed_kn FROM vessels WHERE run_id = ? AND lat IS NOT NULL AND lon IS NOT NULL",
+                    (run_id,)):
+                ships[ship_id] = (lat, lon, length or 0.0, width or 0.0, speed if speed is not None else float('nan'))
+            yield started, ships
+
+    def append_positions(self, positions):
+        """
+        Adds positions to the history, e.g. the area feed of every watch cycle.
+        :param positions: iterable of (ship_id, Unix time, lat, lon, speed or None, course or None);
+            positions already stored for the same ship and time are ignored
+        """
+        with self.db:
+            self.db.executemany("INSERT OR IGNORE INTO positions (ship_id, t, lat, lon, speed_kn, course_deg) VALUES (?, ?, ?, ?, ?, ?)", positions)
+
+    def track(self, ship_id, start=None, end=None):
+        """:return: (Unix time, lat, lon, speed, course) of one vessel within [start, end], oldest first"""
+        start, end = self.window(start, end)
+        return self.db.execute("""SELECT t, lat, lon, speed_kn, course_deg FROM positions
+            WHERE ship_id = ? AND t BETWEEN ? AND ? ORDER BY t""", (ship_id, start, end)).fetchall()
+
+    def positions_in_area(self, shape, start=None, end=None):
+        """
+        All positions inside a shapely geometry within [start, end]. The R*Tree narrows the search to the
+        bounding box and time window, only those candidates are tested against the shape itself.
+        :return: list of (ship_id, Unix time, lat, lon), ordered by ship id and time
+        """
+        start, end = self.window(start, end)
+        minlon, minlat, maxlon, maxlat = shape.bounds
+        rows = self.db.execute("""SELECT positions.ship_id, positions.t, positions.lat, positions.lon
+            FROM positions_rtree JOIN positions ON positions.id = positions_rtree.id
+            WHERE max_lon >= ? AND min_lon <= ? AND max_lat >= ? AND min_lat <= ? AND max_t >= ? AND min_t <= ?
+            AND positions.t BETWEEN ? AND ? ORDER BY positions.ship_id, positions.t""",
+            (minlon, maxlon, minlat, maxlat, start, end, start, end)).fetchall()
+        if not rows:
+            return []
+        import numpy as np
+        import shapely
+
+        shapely.prepare(shape)
+        inside = shapely.contains_xy(shape, np.array([row[3] for row in rows]), np.array([row[2] for row in rows]))
+        return [row for row, keep in zip(rows, inside.tolist()) if keep]
+
+    def vessels_in_area(self, shape, start=None, end=None):
+        """:return: sorted ship ids of all vessels that were inside the shape within [start, end]"""
+        return sorted({row[0] for row in self.positions_in_area(shape, start, end)})
+
+    def window(self, start, end):
+        start = timestamp(start) if start is not None else float('-inf')
+        end = timestamp(end) if end is not None else float('inf')
+        return start, end
+
+    def close(self):
+        self.db.close()
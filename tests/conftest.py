@@ -0,0 +1,6 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Modules live at the top level and the stub service and fixtures under benchmarks/
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'benchmarks')]
@@ -0,0 +1,88 @@
+import random
+
+import pytest
+
+import fixtures
+from extractor import FIELDS, extract_ship_data
+from program import ShipDataAnalyzer
+
+BeautifulSoup = pytest.importorskip('bs4').BeautifulSoup
+
+# Markup the live pages (or a layout change) may put between the cells the extractor reads
+NOISE = ['<br>', '<br/>', '<!-- IMO -->', '<script>var x="<td>IMO</td>";</script>', '&amp;', '&deg;', '&nbsp;',
+         '  \n  ', '<span> </span>', '</p>', '<p>', '<b>', '</b>', '<pre>  a  </pre>', '<img src=x>', '&#176;',
+         '</div>', '</td>', '<td>', '</tr>', '</br>', '<style>td{}</style>', '\t']
+VALUES = ['9123456', "'9123456", '---', '12.3 kn', '180 x 32 m', '36.12345° N', '22.5° W', '12.5° S', 'Tanker',
+          'Sierra Leone', '', '<i>5</i> <b>kn</b>', 'SOUTH EAST', '2024-01-01 12:00 UTC', '&deg;E 12', ' \n ']
+CELLS = ['Port Said', 'Piraeus 12', '2024-05-01 12:00', '3 d', '&amp; x', '<b>Bold</b> y']
+
+
+@pytest.fixture(scope='module')
+def analyzer():
+    return ShipDataAnalyzer(cache_directory=None, store_path=None)
+
+
+def soup_extract(analyzer, html):
+    """The BeautifulSoup path the extractor replaced."""
+    soup = BeautifulSoup(html, 'html.parser')
+    ship_data = {field: analyzer.get_ship_data_field(soup, field) for field in FIELDS}
+    ship_data['Most Visited Ports'] = analyzer.extract_most_visited_ports(soup)
+    ship_data['Last Trips'] = analyzer.extract_last_trips(soup)
+    ship_data['Port Calls'] = analyzer.extract_port_calls(soup)
+    return ship_data
+
+
+def with_noise(html, rng, count):
+    for _ in range(count):
+        position = html.find('<', rng.randrange(len(html)))
+        if position < 0:
+            position = len(html)
+        html = html[:position] + rng.choice(NOISE) + html[position:]
+    return html
+
+
+def random_table(rng, section_id, columns):
+    rows = ''.join('<tr>' + ''.join(f'<td> {rng.choice(CELLS)} </td>' for _ in range(rng.randint(columns - 1, columns + 1))) + '</tr>'
+                   for _ in range(rng.randint(0, 6)))
+    table_class = rng.choice(['myst-table', 'myst-table', 'other'])
+    return f'<div id="{section_id}" class="x"><h3>t</h3><table class="{table_class} other"><tr><th>h</th></tr>{rows}</table></div>'
+
+
+def random_page(rng):
+    """Label/value rows in random order, with missing fields, odd values and stray markup."""
+    fields = list(FIELDS)
+    rng.shuffle(fields)
+    parts = ['<!DOCTYPE html><html><head><title>V</title><script>var IMO=1;</script></head><body><div class="c"><table>']
+    for field in fields:
+        if rng.random() < 0.08:
+            continue
+        value = rng.choice(['9123456', "'9123456", '---', '0', 'abc']) if field == 'IMO' else rng.choice(VALUES)
+        label = field if rng.random() > 0.05 else field + ' '
+        parts.append(f'<tr><td>{label}</td>{rng.choice(["", "<td>", "  "])}<td>{value}</td></tr>')
+    parts.append('</table>')
+    for section_id, columns in (('ft-visitedports', 2), ('ft-lasttrips', 5), ('ft-portcalls', 4)):
+        if rng.random() < 0.9:
+            parts.append(random_table(rng, section_id, columns))
+    parts.append('</div></body></html>')
+    return ''.join(parts)
+
+
+def test_synthetic_pages_match_soup(analyzer):
+    for html in fixtures.synthetic_pages(50):
+        assert extract_ship_data(html) == soup_extract(analyzer, html)
+
+
+def test_noisy_synthetic_pages_match_soup(analyzer):
+    rng = random.Random(11)
+    for html in fixtures.synthetic_pages(50, seed=23):
+        html = with_noise(html, rng, rng.randint(1, 8))
+        assert extract_ship_data(html) == soup_extract(analyzer, html)
+
+
+def test_random_pages_match_soup(analyzer):
+    rng = random.Random(7)
+    for _ in range(500):
+        html = random_page(rng)
+        if rng.random() < 0.5:
+            html = with_noise(html, rng, rng.randint(1, 8))
+        assert extract_ship_data(html) == soup_extract(analyzer, html)
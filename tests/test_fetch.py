@@ -0,0 +1,35 @@
+import time
+
+import fixtures
+from program import ShipDataAnalyzer
+from stub_server import StubService
+
+SHIPS = 32
+LATENCY = 0.05
+
+
+def fetch(stub, workers, directory):
+    analyzer = ShipDataAnalyzer(max_workers=workers, rate_limit=0, base_url=stub.url, cache_directory=None, store_path=None)
+    ship_ids = [row[2] for row in fixtures.ship_rows(SHIPS)]
+    started = time.perf_counter()
+    try:
+        vessels = analyzer.fetch_all_ship_data(ship_ids, str(directory))
+    finally:
+        analyzer.client.close()
+    return vessels, time.perf_counter() - started
+
+
+def test_concurrent_fetch_matches_sequential_and_is_faster(tmp_path):
+    stub = StubService(default_pages=fixtures.synthetic_pages(8), latency=LATENCY)
+    try:
+        sequential, sequential_time = fetch(stub, 1, tmp_path / 'sequential')
+        concurrent, concurrent_time = fetch(stub, 8, tmp_path / 'concurrent')
+    finally:
+        stub.close()
+
+    assert len(sequential) == SHIPS
+    assert concurrent == sequential
+    assert list(concurrent) == list(sequential)
+    # One worker waits SHIPS * LATENCY at least, eight overlap the waits
+    assert sequential_time >= SHIPS * LATENCY
+    assert concurrent_time < sequential_time / 3
@@ -0,0 +1,37 @@
+import numpy as np
+
+from geo import haversine, haversine_np, rectangle_distance, rectangle_distance_np
+
+PAIRS = 2000
+
+
+def random_pairs(seed=3):
+    rng = np.random.default_rng(seed)
+    lat1 = rng.uniform(-70, 70, PAIRS)
+    lon1 = rng.uniform(-180, 180, PAIRS)
+    # Half of the pairs within a few hundred meters, as in pairing, the rest anywhere
+    near = rng.random(PAIRS) < 0.5
+    lat2 = np.where(near, lat1 + rng.normal(0, 0.003, PAIRS), rng.uniform(-70, 70, PAIRS))
+    lon2 = np.where(near, lon1 + rng.normal(0, 0.003, PAIRS), rng.uniform(-180, 180, PAIRS))
+    length1, length2 = rng.uniform(0, 400, PAIRS), rng.uniform(0, 400, PAIRS)
+    width1, width2 = rng.uniform(0, 60, PAIRS), rng.uniform(0, 60, PAIRS)
+    return lat1, lon1, length1, width1, lat2, lon2, length2, width2
+
+
+def test_haversine_np_matches_scalar():
+    lat1, lon1, _, _, lat2, lon2, _, _ = random_pairs()
+    expected = [haversine(*values) for values in zip(lat1.tolist(), lon1.tolist(), lat2.tolist(), lon2.tolist())]
+    assert np.allclose(haversine_np(lat1, lon1, lat2, lon2), expected, rtol=1e-9, atol=1e-6)
+
+
+def test_rectangle_distance_np_matches_scalar():
+    columns = random_pairs()
+    expected = [rectangle_distance(*values) for values in zip(*(column.tolist() for column in columns))]
+    assert np.allclose(rectangle_distance_np(*columns), expected, rtol=1e-9, atol=1e-6)
+
+
+def test_rectangle_distance_np_without_size():
+    lat1, lon1, _, _, lat2, lon2, _, _ = random_pairs(seed=5)
+    zeros = np.zeros(PAIRS)
+    expected = [rectangle_distance(a, b, 0, 0, c, d, 0, 0) for a, b, c, d in zip(lat1.tolist(), lon1.tolist(), lat2.tolist(), lon2.tolist())]
+    assert np.allclose(rectangle_distance_np(lat1, lon1, zeros, zeros, lat2, lon2, zeros, zeros), expected, rtol=1e-9, atol=1e-6)
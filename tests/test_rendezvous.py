@@ -0,0 +1,57 @@
+import json
+
+from program import ShipDataAnalyzer
+from rendezvous import RendezvousDetector
+
+HOUR = 3600
+# Two slow ships about 50 m apart
+PAIR = {'1': (37.5, 23.5, 100.0, 20.0, 0.5), '2': (37.5, 23.50057, 100.0, 20.0, 0.5)}
+ELSEWHERE = {'3': (10.0, 10.0, 100.0, 20.0, 0.5)}
+
+
+def detector():
+    return RendezvousDetector(distance_threshold=75, speed_threshold=2.0, min_duration=2 * HOUR, max_gap=6 * HOUR)
+
+
+def test_encounter_survives_snapshot_of_other_area():
+    rendezvous = detector()
+    snapshots = [(0, PAIR), (HOUR, PAIR), (1.5 * HOUR, ELSEWHERE), (2 * HOUR, PAIR), (3 * HOUR, PAIR)]
+    ended = [encounter for t, ships in snapshots for encounter in rendezvous.update(t, ships)]
+    ended += rendezvous.flush()
+    assert [(encounter.ship1, encounter.ship2, encounter.duration) for encounter in ended] == [('1', '2', 3 * HOUR)]
+
+
+def test_encounter_survives_ship_missing_from_one_snapshot():
+    rendezvous = detector()
+    for t, ships in [(0, PAIR), (HOUR, {'1': PAIR['1']}), (2 * HOUR, PAIR), (3 * HOUR, PAIR)]:
+        assert rendezvous.update(t, ships) == []
+    assert [encounter.samples for encounter in rendezvous.flush()] == [3]
+
+
+def test_encounter_ends_after_max_gap():
+    rendezvous = detector()
+    for t in (0, HOUR, 2 * HOUR):
+        rendezvous.update(t, PAIR)
+    ended = rendezvous.update(9 * HOUR, ELSEWHERE)
+    assert [encounter.duration for encounter in ended] == [2 * HOUR]
+    assert set(rendezvous.ships) == {'3'}
+
+
+def ship_data(ship):
+    lat, lon, length, width, speed = ship
+    return {'IMO': '9123456', 'Latitude': str(lat), 'Longitude': str(lon),
+            'Size': f"{length:.0f} x {width:.0f} m", 'Speed': f"{speed} kn"}
+
+
+def test_detect_rendezvous_replays_each_area(tmp_path):
+    analyzer = ShipDataAnalyzer(cache_directory=None, store_path=str(tmp_path / 'snapshots.sqlite'))
+    runs = [('00-00', 'a', PAIR), ('01-00', 'a', PAIR), ('01-30', 'b', ELSEWHERE), ('02-00', 'a', PAIR), ('03-00', 'a', PAIR)]
+    for time, area, ships in runs:
+        directory = tmp_path / f'data_2024-05-01_{time}-00'
+        directory.mkdir()
+        (directory / 'selected_area.geojson').write_text(json.dumps({'area': area}))
+        list(analyzer.store.record(str(directory), ((ship_id, ship_data(ship)) for ship_id, ship in ships.items())))
+    encounters = analyzer.detect_rendezvous(str(tmp_path), distance_threshold=75, min_hours=2)
+    assert [(encounter.ship1, encounter.ship2, encounter.duration) for encounter in encounters] == [('1', '2', 3 * HOUR)]
+    assert (tmp_path / 'rendezvous.xlsx').exists()
+    analyzer.store.close()
@@ -0,0 +1,40 @@
+import numpy as np
+
+from extractor import extract_ship_data
+from fixtures import synthetic_pages
+from store import SnapshotStore
+from vessel import VesselTable
+
+
+def snapshot(tmp_path):
+    ships = {str(200000000 + number): extract_ship_data(page) for number, page in enumerate(synthetic_pages(40))}
+    # Southern latitudes as written by older extractions
+    for ship in list(ships.values())[::3]:
+        ship['Latitude'] = ship['Latitude'].lstrip('-') + ' -'
+    directory = tmp_path / 'data_2024-05-01_12-00-00'
+    directory.mkdir()
+    return str(directory), ships
+
+
+def test_vessel_table_matches_parsed_vessels(tmp_path):
+    directory, ships = snapshot(tmp_path)
+    store = SnapshotStore(str(tmp_path / 'snapshots.sqlite'))
+    list(store.record(directory, ships.items()))
+    stored, parsed = store.vessel_table(directory), VesselTable.from_vessels(ships)
+    assert stored.ids == parsed.ids
+    for name in parsed.numbers:
+        assert np.array_equal(stored.column(name), parsed.column(name), equal_nan=True), name
+    for name in parsed.codes:
+        assert stored.values(name) == parsed.values(name), name
+    assert store.load(directory) == ships
+    store.close()
+
+
+def test_legacy_coordinates_stored_with_sign(tmp_path):
+    directory, ships = snapshot(tmp_path)
+    store = SnapshotStore(str(tmp_path / 'snapshots.sqlite'))
+    list(store.record(directory, ships.items()))
+    legacy = [ship_id for ship_id, ship in ships.items() if ship['Latitude'].endswith('-')]
+    rows = store.db.execute(f"SELECT lat FROM positions WHERE ship_id IN ({', '.join('?' * len(legacy))})", legacy).fetchall()
+    assert len(rows) == len(legacy) and all(lat < 0 for lat, in rows)
+    store.close()
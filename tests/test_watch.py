@@ -0,0 +1,69 @@
+from watch import AreaWatcher
+
+AREA = {'minlon': 23.0, 'minlat': 37.0, 'maxlon': 24.0, 'maxlat': 38.0, 'shape': None}
+
+
+class FeedAnalyzer:
+    """Stands in for ShipDataAnalyzer with a scripted area feed and detail pages built from it."""
+
+    store = None
+
+    def __init__(self, positions, fail=()):
+        self.positions = positions
+        self.fail = set(fail)
+        self.failed_tiles = 0
+        self.fetches = []
+
+    def get_ships_in_area(self, selected_area):
+        return {mmsi: {'latitude': lat, 'longitude': lon, 'name': mmsi, 'type': 'Cargo'}
+                for mmsi, (lat, lon) in self.positions.items()}
+
+    def fetch_all_ship_data(self, ship_ids, directory, revalidate=False):
+        self.fetches.append((list(ship_ids), revalidate))
+        return {mmsi: {'IMO': '9123456', 'Latitude': str(self.positions[mmsi][0]), 'Longitude': str(self.positions[mmsi][1]),
+                       'Size': '100 x 20 m', 'Speed': '0.5 kn'}
+                for mmsi in ship_ids if mmsi not in self.fail}
+
+
+def watcher(analyzer, tmp_path, events):
+    return AreaWatcher(analyzer, AREA, str(tmp_path), interval=0, move_threshold=1000, on_event=events.append)
+
+
+def test_slow_drift_is_refetched_with_revalidation(tmp_path):
+    analyzer = FeedAnalyzer({'1': (37.1, 23.5)})
+    watch = watcher(analyzer, tmp_path, [])
+    for _ in range(7):
+        # About 445 m per cycle
+        analyzer.positions['1'] = (analyzer.positions['1'][0] + 0.004, 23.5)
+        watch.poll()
+    assert analyzer.fetches == [(['1'], False), (['1'], True), (['1'], True)]
+    assert watch.located['1'][0] == analyzer.positions['1'][0]
+    watch.events_file.close()
+
+
+def test_failed_detail_fetch_is_retried(tmp_path):
+    analyzer = FeedAnalyzer({'1': (37.1, 23.5), '2': (37.1, 23.5005)}, fail={'2'})
+    events = []
+    watch = watcher(analyzer, tmp_path, events)
+    watch.poll()
+    analyzer.fail.clear()
+    watch.poll()
+    assert analyzer.fetches[-1] == (['2'], False)
+    assert [event['event'] for event in events] == ['arrival', 'arrival', 'new_pair']
+    watch.events_file.close()
+
+
+def test_incomplete_feed_reports_no_departures(tmp_path):
+    analyzer = FeedAnalyzer({'1': (37.1, 23.5), '2': (37.1, 23.5005)})
+    events = []
+    watch = watcher(analyzer, tmp_path, events)
+    watch.poll()
+    missing = analyzer.positions.pop('2')
+    analyzer.failed_tiles = 1
+    watch.poll()
+    analyzer.positions['2'] = missing
+    analyzer.failed_tiles = 0
+    watch.poll()
+    assert [event['event'] for event in events] == ['arrival', 'arrival', 'new_pair']
+    assert len(analyzer.fetches) == 1
+    watch.events_file.close()
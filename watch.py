@@ -0,0 +1,173 @@
+import json
+import os
+import time
+from datetime import datetime
+
+from geo import haversine, rectangle_distance
+from pairing import MAX_HALF_DIAGONAL, GridIndex
+from vessel import Vessel
+
+
+class AreaWatcher:
+    """
+    Polls an area on a schedule and reports what changed since the previous snapshot.
+
+    Detail pages are only fetched for vessels that are new or moved more than move_threshold meters
+    since their last detail fetch, and pairs are only re-evaluated around those vessels, so the work per cycle follows the number
+    of changes rather than the size of the fleet. Events are printed, appended to events.jsonl in the
+    watch directory and passed to on_event.
+    """
+
+    def __init__(self, analyzer, selected_area, directory, interval=300, move_threshold=500,
+                 distance_threshold=75, speed_threshold=None, on_event=None, rendezvous=None):
+        self.analyzer = analyzer
+        self.selected_area = selected_area
+        self.directory = directory
+        self.interval = interval
+        self.move_threshold = move_threshold
+        self.distance_threshold = distance_threshold
+        self.speed_threshold = speed_threshold
+        self.on_event = on_event
+        # Optional RendezvousDetector fed with every snapshot
+        self.rendezvous = rendezvous
+        # Latest feed entry of every vessel in the area, and the feed position at its last detail fetch
+        self.present = {}
+        self.positions = {}
+        self.ships = {}
+        self.located = {}
+        self.pairs = {}
+        reach = (distance_threshold + 2 * MAX_HALF_DIAGONAL) * 1.01 + 1.0
+        max_lat = max(abs(selected_area['minlat']), abs(selected_area['maxlat']))
+        self.grid = GridIndex([], [], reach, max_lat=max_lat)
+        self.events_file = open(os.path.join(directory, 'events.jsonl'), 'a', encoding='utf-8')
+
+    def run(self, cycles=None):
+        """Polls every interval seconds until interrupted, or for the given number of cycles."""
+        cycle = 0
+        try:
+            while cycles is None or cycle < cycles:
+                started = time.monotonic()
+                self.poll()
+                cycle += 1
+                if cycles is None or cycle < cycles:
+                    time.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+        except KeyboardInterrupt:
+            print("\nÜberwachung beendet.")
+        finally:
+            self.save_snapshot()
+            self.events_file.close()
+
+    def poll(self):
+        current = self.analyzer.get_ships_in_area(self.selected_area)
+        if not current and self.present:
+            print("Keine Schiffe empfangen, Zyklus wird übersprungen.")
+            return
+        # Vessels of tiles that failed are missing from an incomplete feed, they have not left the area
+        complete = not self.analyzer.failed_tiles
+
+        now = time.time()
+        if self.analyzer.store:
+            self.analyzer.store.append_positions((mmsi, now, entry['latitude'], entry['longitude'], None, None)
+                                                 for mmsi, entry in current.items())
+
+        arrived = [mmsi for mmsi in current if mmsi not in self.present]
+        departed = [mmsi for mmsi in self.present if mmsi not in current] if complete else []
+        # Movement counts from the position of the last detail fetch, so slow drift adds up until it is refetched
+        moved = [mmsi for mmsi in current if mmsi in self.positions and self.has_moved(self.positions[mmsi], current[mmsi])]
+
+        for mmsi in departed:
+            self.emit('departure', mmsi, **self.present[mmsi])
+            self.forget(mmsi)
+        for mmsi in arrived:
+            self.emit('arrival', mmsi, **current[mmsi])
+        self.present = dict(current) if complete else {**self.present, **current}
+
+        # Vessels whose detail fetch failed before have no position yet and are tried again. Cached pages
+        # of moved vessels predate the move, so those are revalidated.
+        unfetched = [mmsi for mmsi in current if mmsi not in self.positions]
+        details = self.analyzer.fetch_all_ship_data(unfetched, self.directory) if unfetched else {}
+        if moved:
+            details.update(self.analyzer.fetch_all_ship_data(moved, self.directory, revalidate=True))
+        for mmsi in unfetched + moved:
+            if mmsi in details:
+                self.positions[mmsi] = current[mmsi]
+                self.ships[mmsi] = details[mmsi]
+                self.update_pairs(mmsi)
+        if self.rendezvous:
+            # Vessels missing from this feed keep their open encounters in the detector until max_gap
+            seen = {mmsi: ship for mmsi, ship in self.located.items() if mmsi in current}
+            for encounter in self.rendezvous.update(now, seen):
+                summary = encounter.to_dict()
+                self.emit('rendezvous', summary.pop('ship1'), other=summary.pop('ship2'), **summary)
+        print(f"{datetime.now():%H:%M:%S} {len(current)} Schiffe, {len(arrived)} neu, {len(departed)} abgefahren, {len(moved)} bewegt"
+              + ("" if complete else f", {self.analyzer.failed_tiles} Kacheln fehlgeschlagen"))
+
+    def has_moved(self, previous, current):
+        distance = haversine(previous['latitude'], previous['longitude'], current['latitude'], current['longitude'])
+        return distance > self.move_threshold
+
+    def update_pairs(self, mmsi):
+        """Moves a vessel in the grid and re-evaluates only the pairs it is part of."""
+        if mmsi in self.located:
+            lat, lon = self.located.pop(mmsi)[:2]
+            self.grid.remove(mmsi, lat, lon)
+        vessel = Vessel.from_data(mmsi, self.ships[mmsi])
+        if not vessel.has_position:
+            for other in list(self.pairs.get(mmsi, {})):
+                self.unpair(mmsi, other)
+            return
+        ship = vessel.geometry()
+        self.located[mmsi] = ship
+        lat, lon, length, width, speed = ship
+        self.grid.add(mmsi, lat, lon)
+
+        partners = {}
+        if self.is_slow(speed):
+            for other in self.grid.query(lat, lon):
+                if other == mmsi:
+                    continue
+                other_lat, other_lon, other_length, other_width, other_speed = self.located[other]
+                if not self.is_slow(other_speed):
+                    continue
+                distance = rectangle_distance(lat, lon, length, width, other_lat, other_lon, other_length, other_width)
+                if distance <= self.distance_threshold:
+                    partners[other] = distance
+
+        previous = self.pairs.get(mmsi, {})
+        for other in previous.keys() - partners.keys():
+            self.unpair(mmsi, other)
+        for other, distance in partners.items():
+            if other not in previous:
+                self.emit('new_pair', mmsi, other=other, distance=round(distance, 2))
+            self.pairs.setdefault(mmsi, {})[other] = distance
+            self.pairs.setdefault(other, {})[mmsi] = distance
+
+    def is_slow(self, speed):
+        return not self.speed_threshold or speed <= self.speed_threshold
+
+    def unpair(self, mmsi, other):
+        self.pairs[mmsi].pop(other, None)
+        self.pairs[other].pop(mmsi, None)
+        self.emit('pair_ended', mmsi, other=other)
+
+    def forget(self, mmsi):
+        for other in list(self.pairs.get(mmsi, {})):
+            self.unpair(mmsi, other)
+        self.pairs.pop(mmsi, None)
+        if mmsi in self.located:
+            lat, lon = self.located.pop(mmsi)[:2]
+            self.grid.remove(mmsi, lat, lon)
+        self.positions.pop(mmsi, None)
+        self.ships.pop(mmsi, None)
+
+    def emit(self, event, mmsi, **fields):
+        record = {'time': datetime.now().isoformat(timespec='seconds'), 'event': event, 'mmsi': mmsi, **fields}
+        self.events_file.write(json.dumps(record) + '\n')
+        self.events_file.flush()
+        print(f"[{record['time']}] {event} {mmsi} " + ' '.join(f"{key}={value}" for key, value in fields.items()))
+        if self.on_event:
+            self.on_event(record)
+
+    def save_snapshot(self):
+        self.analyzer.save_vessels(self.directory, self.ships.items())
+